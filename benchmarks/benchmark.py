@@ -0,0 +1,229 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Time the driver hot paths against simulated hardware
+
+import gc
+import json
+import sys
+
+"""Driver benchmarks, latency and heap allocation per call
+
+Run from the repository with CPython 3, the simulated hardware does not
+run on micropython:
+python3 benchmarks/benchmark.py [results.json] [--compare old.json]
+
+Exported functions:
+measure -- Time a function and the heap it allocates
+run -- Run every benchmark, returns the results
+compare -- Find results that got worse than a baseline
+main -- Run, save and compare from the command line
+
+"""
+
+sys.path.insert(0, (__file__.rpartition("/")[0] or ".") + "/../sim")
+
+import sim  # noqa: E402
+sim.install()
+
+from time import ticks_us, ticks_diff  # noqa: E402
+import tracemalloc  # noqa: E402
+
+# Calls made for each benchmark, and how much worse a result has to be
+# than the baseline to count as a regression
+CALLS = 200
+THRESHOLD = 1.2
+
+
+def measure(function, calls=CALLS):
+    """Time a function and the heap it allocates.
+
+    CPython returns freed memory straight away, so the peak heap growth
+    is used, which is lower than everything allocated.
+
+    Returns:
+    dict -- us_per_call, bytes_per_call, calls
+
+    """
+
+    # One untimed call, so caches and buffers are already set up
+    function()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = ticks_us()
+    for _ in range(calls):
+        function()
+    elapsed = ticks_diff(ticks_us(), start)
+    allocated = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return ({"us_per_call": elapsed / calls,
+             "bytes_per_call": max(0, allocated) / calls,
+             "calls": calls})
+
+
+def _quiet(device):
+    """Stop a simulated UART keeping everything written to it."""
+
+    device.uart.record = False
+    return (device)
+
+
+def _eink():
+    import eink
+    import eink_graph
+    from array import array
+
+    display = _quiet(eink.EINK_display(25, 26))
+    graph = eink_graph.EINK_graph(display, 0, 300, 400, 200)
+    history = array("f", [(i * 7) % 23 for i in range(3600)])
+    frame = bytearray(270)
+    text = ["value: 123.4", "value: 567.8"]
+    state = [0]
+
+    def write_line_changed():
+        state[0] ^= 1
+        display.write_line(text[state[0]], "large", 2)
+
+    def write_line_batch():
+        display.begin()
+        for line in range(1, 11):
+            display.write_line(text[state[0]], "large", line)
+        state[0] ^= 1
+        display.commit()
+
+    return ({
+        "eink.write_string": lambda: display.write_string("value: 123.4",
+                                                          0, 60),
+        "eink.write_line_changed": write_line_changed,
+        "eink.write_line_unchanged": lambda: display.write_line(
+            "same", "large", 3),
+        "eink.write_line_batch_10": write_line_batch,
+        "eink._calculate_parity_270": lambda: display._calculate_parity(
+            frame),
+        "eink.graph_draw_3600": lambda: graph.draw(history),
+    })
+
+
+def _pm25():
+    import pm25
+
+    sensor = _quiet(pm25.PM25_sensor(25, 26))
+    frames = sim.pm25_frame(10, 12, 15) * 4
+
+    def read_sensor():
+        sensor.uart.feed(b"\x00\x42" + frames, delay=0)
+        sensor.read_sensor()
+
+    return ({"pm25.read_sensor_4_frames": read_sensor})
+
+
+def _bme680():
+    import bme680_wrapper
+
+    sensor = bme680_wrapper.BME680_sensor(22, 21)
+    cached = bme680_wrapper.BME680_sensor(22, 21, cache_ttl=60)
+
+    def read_each():
+        sensor.read_temperature()
+        sensor.read_pressure()
+        sensor.read_gas_resistance()
+        sensor.read_humidity()
+
+    return ({
+        "bme680.read_all": sensor.read_all,
+        "bme680.read_each_value": read_each,
+        "bme680.read_all_cached": cached.read_all,
+        "bme680.read_iaq": sensor.read_iaq,
+    })
+
+
+def _co2():
+    import CO2
+
+    sensor = CO2.CO2_sensor(36)
+    sensor.adc.noise = 5
+
+    # Continuous sampling, the timer callback is called directly
+    sampled = CO2.CO2_sensor(36)
+    sampled.adc.noise = 5
+    sampled.start(size=256)
+    sampled.stop()
+    for i in range(256):
+        sampled._sample(None)
+    return ({
+        "co2.read_sensor": sensor.read_sensor,
+        "co2.read_burst_16": sensor.read_burst,
+        "co2.sample": lambda: sampled._sample(None),
+        "co2.read_latest": sampled.read_latest,
+        "co2.read_average_256": sampled.read_average,
+    })
+
+
+def run(calls=CALLS):
+    """Run every benchmark, returns a dict of results keyed by name"""
+
+    results = {}
+    for group in (_eink, _pm25, _bme680, _co2):
+        benchmarks = group()
+        for name in sorted(benchmarks):
+            results[name] = measure(benchmarks[name], calls)
+    return (results)
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Find results that got worse than a baseline.
+
+    Returns:
+    list -- (name, metric, baseline value, new value) tuples
+
+    """
+
+    worse = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in ("us_per_call", "bytes_per_call"):
+            # Small absolute numbers are noise, not regressions
+            if result[metric] > old[metric] * threshold and \
+                    result[metric] - old[metric] > 1:
+                worse.append((name, metric, old[metric], result[metric]))
+    return (worse)
+
+
+def main(argv):
+    output = None
+    baseline = None
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == "--compare":
+            baseline = args.pop(0)
+        else:
+            output = arg
+
+    results = run()
+    report = {"implementation": sys.implementation.name,
+              "platform": sys.platform,
+              "results": results}
+    for name in sorted(results):
+        print("{0:32} {1:10.1f} us {2:8.1f} bytes".format(
+            name, results[name]["us_per_call"],
+            results[name]["bytes_per_call"]))
+    if output is not None:
+        with open(output, "w") as result_file:
+            json.dump(report, result_file)
+
+    if baseline is not None:
+        with open(baseline) as baseline_file:
+            old = json.load(baseline_file)["results"]
+        worse = compare(results, old)
+        for name, metric, before, after in worse:
+            print("REGRESSION {0} {1}: {2:.1f} -> {3:.1f}".format(
+                name, metric, before, after))
+        if worse:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Time boot to first reading and heap use for each profile
+
+import gc
+import json
+import sys
+
+"""Boot benchmark, each node profile measured in a fresh interpreter
+
+Run from the repository with CPython 3:
+python3 benchmarks/boot.py [results.json]
+or one profile at a time:
+python3 benchmarks/boot.py --profile air
+
+Exported functions:
+measure -- Boot one profile and take the first reading
+main -- Measure every profile from the command line
+
+"""
+
+_HERE = __file__.rpartition("/")[0] or "."
+sys.path.insert(0, _HERE + "/../sim")
+sys.path.insert(0, _HERE + "/..")
+
+import sim  # noqa: E402
+sim.install()
+
+from time import ticks_us, ticks_diff  # noqa: E402
+import tracemalloc  # noqa: E402
+
+
+def _prepare(driver):
+    """Script the simulated device so its first reading succeeds."""
+
+    name = type(driver).__name__
+    if name == "PM25_sensor":
+        driver.uart.feed(sim.pm25_frame(10, 12, 15), delay=0)
+    elif name == "EINK_display":
+        driver.uart.responder = sim.eink_responder()
+
+
+def _heap():
+    """Heap in use, after a collection"""
+
+    gc.collect()
+    return (tracemalloc.get_traced_memory()[0])
+
+
+def measure(name):
+    """Boot one profile and take the first reading from every driver.
+
+    Call in a fresh interpreter, modules already imported are not
+    counted.
+
+    Returns:
+    dict -- boot_ms (imports and set up), first_reading_ms, heap_bytes
+            used by the drivers and modules imported
+
+    """
+
+    # Built into the firmware on a device, so not counted
+    import machine  # noqa: F401
+    import network  # noqa: F401
+
+    tracemalloc.start()
+    modules = len(sys.modules)
+    heap = _heap()
+
+    start = ticks_us()
+    import esp32_modules
+    from esp32_modules.profiles import PROFILES
+    profile = PROFILES[name]
+    drivers = esp32_modules.start(profile)
+    booted = ticks_us()
+    for driver_name, driver in drivers.items():
+        _prepare(driver)
+    prepared = ticks_us()
+    for driver_name, driver in drivers.items():
+        if "read" in profile[driver_name]:
+            getattr(driver, profile[driver_name]["read"])()
+    read = ticks_us()
+
+    heap = _heap() - heap
+    tracemalloc.stop()
+    return ({"boot_ms": ticks_diff(booted, start) / 1000,
+             "first_reading_ms": (ticks_diff(read, start) -
+                                  ticks_diff(prepared, booted)) / 1000,
+             "heap_bytes": heap,
+             "modules": len(sys.modules) - modules})
+
+
+def main(argv):
+    if argv[:1] == ["--profile"]:
+        print(json.dumps(measure(argv[1])))
+        return
+
+    import subprocess
+    from esp32_modules.profiles import PROFILES
+
+    results = {}
+    for name in sorted(PROFILES):
+        output = subprocess.check_output([sys.executable, __file__,
+                                          "--profile", name])
+        results[name] = json.loads(output.decode().splitlines()[-1])
+        print("{0:10} boot {1:7.1f} ms  first reading {2:7.1f} ms  "
+              "heap {3:7} bytes  {4:2} modules".format(
+                  name, results[name]["boot_ms"],
+                  results[name]["first_reading_ms"],
+                  results[name]["heap_bytes"], results[name]["modules"]))
+    if argv:
+        with open(argv[0], "w") as result_file:
+            json.dump({"implementation": sys.implementation.name,
+                       "platform": sys.platform,
+                       "results": results}, result_file)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
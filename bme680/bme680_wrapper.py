@@ -3,14 +3,18 @@
 # Description : Read the DF robot bme680 sensor
 
 import bme680
-from i2c import I2CAdapter
-import machine
-from time import sleep
+from i2c_bus import get_bus
+from driver_stats import Driver_stats
+from collections import namedtuple
+from array import array
+from time import ticks_ms, ticks_diff
 
 """BME60_wrapper , read values from the BME680 sensor easily
 
 Exported class's:
+IAQ_estimator -- Score IAQ against a rolling gas baseline
 BME680Base -- Use to Initialize the sensor
+read_all -- Get every reading from a single measurement
 read_temperature -- Get temperature (Celsius)
 read_pressure -- Get pressure reading (hPa)
 read_gas_resistance -- Get gas reading (ohms)
@@ -28,19 +32,154 @@ class SensorPolling(Exception):
     pass
 
 
-class BME680Base:
-    def __init__(self, scl_pin, sda_pin):
+# One measurement, tuple order matches _get_sensor_data()
+BME680_data = namedtuple("BME680_data", ("temperature", "pressure",
+                                         "gas_resistance", "humidity"))
+
+
+class IAQ_estimator:
+    # 40% is deemed a good indoor quality baseline for humidity
+    humidity_baseline = 40
+    # Defines how much weight humidity should play in air quality
+    humidity_weighting = 0.25
+
+    def __init__(self, window=60):
+        """Set up the gas baseline.
+
+        Keyword arguments:
+        window -- number of gas readings the baseline is averaged over
+
+        """
+
+        # Ring buffer of the last gas readings and their running total
+        self._gas = array('f', [0] * window)
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+        self.score = None
+
+    def baseline(self):
+        """Average gas reading in the window, None before any readings."""
+
+        if self._count == 0:
+            return (None)
+        return (self._total / self._count)
+
+    def save_state(self):
+        """Get the baseline to keep across a deep sleep, None if empty
+
+        Returns:
+        list -- baseline, number of readings it is averaged over
+
+        """
+
+        if self._count == 0:
+            return (None)
+        return ([self._total / self._count, self._count])
+
+    def load_state(self, state):
+        """Restore a baseline from save_state()
+
+        The window is filled with the baseline, so the average is the
+        same and new readings replace it one at a time.
+
+        """
+
+        if state is None:
+            return
+        baseline, count = state
+        count = min(count, len(self._gas))
+        for i in range(count):
+            self._gas[i] = baseline
+        self._count = count
+        self._index = count % len(self._gas)
+        self._total = baseline * count
+
+    def add(self, gas_resistance, humidity):
+        """Add a reading and return the new IAQ score 0-100%."""
+
+        humidity_baseline = self.humidity_baseline
+        humidity_weighting = self.humidity_weighting
+
+        #  How far is the humidity off from the baseline humidity
+        humidity_offset = humidity - humidity_baseline
+
+        # From the above humidity offset,
+        # we could end up with a positive or negative
+        # we need to handle the math to score a positive
+        # value and negative value different
+        if humidity_offset > 0:
+            humidity_score = (100 - humidity_baseline - humidity_offset) / \
+                             (100 - humidity_baseline) * \
+                              (humidity_weighting * 100)
+        else:
+            humidity_score = (humidity_baseline + humidity_offset) / \
+                             humidity_baseline * (humidity_weighting * 100)
+
+        # Replace the oldest gas reading, keeping the total up to date
+        gas = self._gas
+        if self._count == len(gas):
+            self._total -= gas[self._index]
+        else:
+            self._count += 1
+        gas[self._index] = gas_resistance
+        self._total += gas_resistance
+        self._index = (self._index + 1) % len(gas)
+        gas_baseline = self._total / self._count
+
+        # A gas resistance below the baseline means worse air,
+        # same logic as the humidity score
+        if gas_resistance < gas_baseline:
+            gas_score = (gas_resistance / gas_baseline) * \
+                        (100 - (humidity_weighting * 100))
+        else:
+            gas_score = 100 - (humidity_weighting * 100)
+
+        # add the scores together , max of 100
+        # 100 is perfect
+        # 0 is your dead
+        self.score = humidity_score + gas_score
+        return (self.score)
+
+
+class BME680Base(Driver_stats):
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("measurements", "cache_hits", "measure_ms",
+                   "sensor_unstable", "sensor_polling")
+
+    def __init__(self, scl_pin, sda_pin, cache_ttl=0, address=None):
         """Initialize the sensor.
 
         Keyword arguments:
         scl_pin -- pin number of the I2C Serial Clock line
         sda_pin -- pin number of the I2C Serial Data line
+        cache_ttl -- seconds a measurement is reused for, 0 to disable
+        address -- I2C address, the bme680 library default if None. Give
+                   bme680.I2C_ADDR_PRIMARY or I2C_ADDR_SECONDARY to run
+                   two sensors on the same pins
 
         """
 
-        i2c_dev = I2CAdapter(scl=machine.Pin(scl_pin),
-                             sda=machine.Pin(sda_pin))
-        sensor = bme680.BME680(i2c_device=i2c_dev)
+        # Last measurement and the ticks_ms() it was taken at
+        self.cache_ttl = cache_ttl
+        self._snapshot = None
+        self._snapshot_time = 0
+        self.iaq = IAQ_estimator()
+        # Counters, None while counting is off
+        self._stats = None
+
+        # Every sensor on the same pins shares one bus
+        self.bus = get_bus(scl_pin, sda_pin)
+        with self.bus:
+            self._setup(address)
+
+    def _setup(self, address):
+        """Create the library sensor and configure it."""
+
+        if address is None:
+            sensor = bme680.BME680(i2c_device=self.bus)
+        else:
+            sensor = bme680.BME680(i2c_addr=address, i2c_device=self.bus)
         self.sensor = sensor
 
         # Set up the over sampling and filters
@@ -60,27 +199,70 @@ class BME680Base:
         sensor.set_gas_heater_duration(150)
         sensor.select_gas_heater_profile(0)
 
+    def save_state(self):
+        """Get the IAQ baseline to keep across a deep sleep"""
+
+        return (self.iaq.save_state())
+
+    def load_state(self, state):
+        """Restore the IAQ baseline from save_state()"""
+
+        self.iaq.load_state(state)
+
 
 class BME680_sensor(BME680Base):
-    def _get_sensor_data(self):
+    def _get_sensor_data(self, fresh=False):
         """Get the sensor data, returns a tuple
 
+        Keyword arguments:
+        fresh -- always measure, even if a cached measurement is valid
+
         Returns:
         tuple -- temperature, pressure, gas_resistance, humidity
 
         """
 
-        sensor_data = self.sensor.get_sensor_data()
+        if not fresh and self._snapshot is not None and \
+                ticks_diff(ticks_ms(), self._snapshot_time) < \
+                self.cache_ttl * 1000:
+            if self._stats is not None:
+                self._stats["cache_hits"] += 1
+            return (self._snapshot)
+
+        stats = self._stats
+        if stats is not None:
+            start = ticks_ms()
+        # Hold the bus for the whole measurement
+        with self.bus:
+            sensor_data = self.sensor.get_sensor_data()
         heater_stable = self.sensor.data.heat_stable
+        if stats is not None:
+            stats["measurements"] += 1
+            stats["measure_ms"] += ticks_diff(ticks_ms(), start)
         if sensor_data and heater_stable:
             temperature = self.sensor.data.temperature
             pressure = self.sensor.data.pressure
             gas_resistance = self.sensor.data.gas_resistance
             humidity = self.sensor.data.humidity
-            return (temperature, pressure, gas_resistance, humidity)
+            self._snapshot = BME680_data(temperature, pressure,
+                                         gas_resistance, humidity)
+            self._snapshot_time = ticks_ms()
+            return (self._snapshot)
         else:
+            if stats is not None:
+                stats["sensor_unstable"] += 1
             raise SensorUnstable("Sensor not ready")
 
+    def read_all(self):
+        """Get every reading from one measurement
+
+        Returns:
+        BME680_data -- temperature, pressure, gas_resistance, humidity
+
+        """
+
+        return (self._get_sensor_data())
+
     def read_temperature(self):
         """Get the temperature reading, returns a float"""
 
@@ -115,58 +297,28 @@ class BME680_sensor(BME680Base):
 
         reading = None
         try:
-            reading = self._get_sensor_data()[2:4]
+            # The baseline needs a new reading each time, never the cache
+            reading = self._get_sensor_data(fresh=True)[2:4]
             return(reading)
         except IndexError:
+            if self._stats is not None:
+                self._stats["sensor_polling"] += 1
             raise SensorPolling("Attempted to fetch data too quickly")
 
-    def read_iaq(self):
-        """Calculate an IAQ score 0-100%, returns a float"""
-
-        # 40% is deemed a good indoor quality baseline for humidity
-        humidity_baseline = 40
-        # Defines how much weight humidity should play in air quality
-        humidity_weighting = 0.25
+    def read_iaq(self, reading=None):
+        """Calculate an IAQ score 0-100%, returns a float
 
-        # Read the sensor once to get humidity and raw gas values
-        reading_1 = self._get_iaq_data()
-        gas_resistance_reading = reading_1[0]
-        humidity_reading = reading_1[1]
-
-        #  How far is the reading_1 humidity off from the baseline humidity
-        humidity_offset = humidity_reading - humidity_baseline
-
-        # From the above humidity offset,
-        # we could end up with a positive or negative
-        # we need to handle the math to score a positive
-        # value and negative value different
-        if humidity_offset > 0:
-            humidity_score = (100 - humidity_baseline - humidity_offset) / \
-                             (100 - humidity_baseline) * \
-                              (humidity_weighting * 100)
-        else:
-            humidity_score = (humidity_baseline + humidity_offset) / \
-                             humidity_baseline * (humidity_weighting * 100)
+        Keyword arguments:
+        reading -- a BME680_data from read_all() to score instead of
+                   taking a new measurement
 
-        # BME60 gas sensor has a refresh of 1s
-        sleep(1)
-        # Take another reading of the gas
-        reading_2 = self._get_iaq_data()
-        gas_resistance_reading_2 = reading_2[0]
+        Does not wait, the gas reading is scored against the rolling
+        baseline kept by self.iaq.
 
-        # Work out the offset between our two gas readings
-        gas_offset = gas_resistance_reading - gas_resistance_reading_2
+        """
 
-        # From the above gas offset, we could end up with positive or negative
-        # same logic as the humidity score
-        if gas_offset > 0:
-            gas_score = (gas_resistance_reading_2 / gas_resistance_reading) * \
-                        (100 - (humidity_weighting * 100))
+        if reading is None:
+            gas_resistance, humidity = self._get_iaq_data()
         else:
-            gas_score = 100 - (humidity_weighting * 100)
-
-        # add the scores together , max of 100
-        # 100 is perfect
-        # 0 is your dead
-        iaq_percent = humidity_score + gas_score
-        return (iaq_percent)
+            gas_resistance, humidity = reading[2], reading[3]
+        return (self.iaq.add(gas_resistance, humidity))
@@ -2,53 +2,334 @@
 # License : BSD 3-Clause
 # Description : Read the DF robot co2 laser sensor
 
-from machine import ADC, Pin
+from array import array
+from machine import ADC, Pin, Timer
+from driver_stats import Driver_stats
 
 """CO2_sensor, read then caculate the co2 concentration
 
 Exported class's:
 CO2_base -- Used to Initialize the sensor
-CO2_sensor -- Get Co2 concentration (ppm)
+CO2_sensor -- Get Co2 concentration (ppm), on demand or from continuous
+              sampling with start()
 
 """
 
 
-class CO2_sensor_not_ready():
+class CO2_sensor_not_ready(Exception):
     pass
 
 
-class CO2_base:
-    def __init__(self, pin):
+class CO2_invalid_calibration(Exception):
+    pass
+
+
+class CO2_base(Driver_stats):
+    def __init__(self, pin, samples=16):
         """Initialize the sensor.
 
         Keyword arguments:
         pin -- pin number of an ADC pin
+        samples -- number of ADC samples taken by read_burst()
 
         """
 
         self.pin = pin
 
+        # set the ADC up once
+        # 12 bit wide, 11DB attenuation
+        adc = ADC(Pin(pin))
+        adc.atten(adc.ATTN_11DB)
+        adc.width(adc.WIDTH_12BIT)
+        self.adc = adc
+
+        # Burst samples are stored here, so reads do not allocate
+        self._samples = array('H', [0] * samples)
+
+        # (reading, true ppm) points from calibrate(), None if not set
+        self._calibration = None
+        # ppm for every ADC code, 0 while the sensor is not ready
+        self._table = None
+        # Continuous sampling, set up by start()
+        self._timer = None
+        self._ring = None
+        self._ring_index = 0
+        self._ring_count = 0
+        self.rate = 0
+
+        # Counters, None while counting is off
+        self._stats = None
+
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("adc_reads", "sensor_not_ready")
+
 
 class CO2_sensor(CO2_base):
-    def read_sensor(self):
-        """Get the Co2 reading, returns a float"""
+    # Divide the voltage 3v3 by the ADC levels at 12bit
+    _MV_PER_CODE = 3300 / 4095.0
+    # Below taken from df robot site SKU : SEN0219 wiki
+    # 400mv is 0ppm, every 16mv after that is 50ppm
+    _ZERO_MV = 400
+    _PPM_PER_MV = 50.0 / 16.0
 
-        adc = ADC(Pin(self.pin))
+    # 12 bit ADC
+    _CODES = 4096
 
-        # set the ADC up
-        # 12 bit wide, 11DB attenuation
-        adc.atten(adc.ATTN_11DB)
-        adc.width(adc.WIDTH_12BIT)
+    def calibrate(self, points=None):
+        """Set a calibration curve for this sensor
+
+        Readings are corrected by straight lines between the points, the
+        first and last lines carry on past the ends. A single point
+        shifts every reading by the same amount.
 
-        sensorValue = adc.read()
+        Keyword arguments:
+        points -- (reading in ppm, true ppm) pairs, such as readings
+                  taken next to a reference meter, None to remove the
+                  calibration
 
-        # Divide the voltage 3v3 by the ADC levels at 12bit
-        voltage = sensorValue*(3300/4095.0)
 
-        # Below taken from df robot site SKU : SEN0219 wiki
-        voltage_diference = voltage-400
-        concentration = voltage_diference*50.0/16.0
+        """
+
+        if points is not None:
+            points = sorted(points)
+            if not points:
+                raise CO2_invalid_calibration("No calibration points")
+            for i in range(1, len(points)):
+                if points[i][0] == points[i - 1][0]:
+                    raise CO2_invalid_calibration(
+                        "Two points for reading {0}".format(points[i][0]))
+        self._calibration = points
+        if self._table is not None:
+            self._build_table()
+
+    def _calibrate(self, ppm):
+        """Apply the calibration curve to a ppm reading."""
+
+        points = self._calibration
+        if points is None:
+            return (ppm)
+        if len(points) == 1:
+            return (ppm + points[0][1] - points[0][0])
+        i = 1
+        while i < len(points) - 1 and ppm > points[i][0]:
+            i += 1
+        reading_0, true_0 = points[i - 1]
+        reading_1, true_1 = points[i]
+        return (true_0 + (ppm - reading_0) * (true_1 - true_0) /
+                (reading_1 - reading_0))
+
+    def _code_ppm(self, code):
+        """Whole ppm for an ADC code, 0 if the sensor is not ready."""
+
+        concentration = (code * self._MV_PER_CODE - self._ZERO_MV) * \
+            self._PPM_PER_MV
+        if concentration <= 0:
+            return (0)
+        return (min(max(int(self._calibrate(concentration) + 0.5), 1),
+                    0xFFFF))
+
+    def _build_table(self):
+        """Work out the ppm of every ADC code once."""
+
+        self._table = array('H', (self._code_ppm(code)
+                                  for code in range(self._CODES)))
+
+    def _to_ppm(self, sensorValue):
+        """Convert an ADC reading to ppm, raises if the sensor is not ready"""
+
+        voltage = sensorValue * self._MV_PER_CODE
+
+        voltage_diference = voltage - self._ZERO_MV
+        concentration = voltage_diference * self._PPM_PER_MV
         if concentration > 0:
-            return(concentration)
+            return (self._calibrate(concentration))
         else:
+            if self._stats is not None:
+                self._stats["sensor_not_ready"] += 1
             raise CO2_sensor_not_ready("Co2 sensor not ready")
+
+    def read_sensor(self):
+        """Get the Co2 reading, returns a float"""
+
+        if self._stats is not None:
+            self._stats["adc_reads"] += 1
+        return (self._to_ppm(self.adc.read()))
+
+    def read_burst(self, median=True):
+        """Get the Co2 reading from a burst of ADC samples
+
+        Keyword arguments:
+        median -- use the median sample, otherwise the mean of the
+                  middle half of the samples
+
+        Returns:
+        tuple -- concentration (ppm), variance of the samples (ppm^2)
+
+        """
+
+        samples = self._samples
+        count = len(samples)
+        read = self.adc.read
+        for i in range(count):
+            samples[i] = read()
+        if self._stats is not None:
+            self._stats["adc_reads"] += count
+
+        # Insertion sort in place, bursts are short
+        for i in range(1, count):
+            value = samples[i]
+            j = i - 1
+            while j >= 0 and samples[j] > value:
+                samples[j + 1] = samples[j]
+                j -= 1
+            samples[j + 1] = value
+
+        total = 0
+        total_squared = 0
+        for value in samples:
+            total += value
+            total_squared += value * value
+        mean = total / count
+        variance = total_squared / count - mean * mean
+
+        if median:
+            middle = count // 2
+            if count % 2:
+                code = samples[middle]
+            else:
+                code = (samples[middle - 1] + samples[middle]) / 2
+        else:
+            trim = count // 4
+            code = 0
+            for i in range(trim, count - trim):
+                code += samples[i]
+            code = code / (count - 2 * trim)
+
+        # the variance scales with the square of the ppm per ADC level
+        scale = self._MV_PER_CODE * self._PPM_PER_MV
+        return (self._to_ppm(code), variance * scale * scale)
+
+    def start(self, rate=10, size=256, timer=0):
+        """Sample the ADC continuously from a hardware timer
+
+        Samples go into a ring buffer of ADC codes, read them with
+        read_latest(), read_average() and read_trend(). The timer
+        callback only stores integers, so it does not allocate.
+
+        Keyword arguments:
+        rate -- samples a second
+        size -- samples kept, the oldest are overwritten
+        timer -- hardware timer number
+
+
+        """
+
+        self.stop()
+        if self._table is None:
+            self._build_table()
+        self._ring = array('H', [0] * size)
+        self._ring_index = 0
+        self._ring_count = 0
+        self.rate = rate
+        # Looked up once, not on every sample
+        self._read_adc = self.adc.read
+        self._timer = Timer(timer)
+        self._timer.init(period=max(int(1000 / rate), 1), mode=Timer.PERIODIC,
+                         callback=self._sample)
+
+    def stop(self):
+        """Stop continuous sampling, the samples taken are kept"""
+
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+
+    def _sample(self, timer):
+        """Timer callback, store one ADC code. Must not allocate."""
+
+        ring = self._ring
+        i = self._ring_index
+        ring[i] = self._read_adc()
+        i += 1
+        if i == len(ring):
+            i = 0
+        self._ring_index = i
+        if self._ring_count < len(ring):
+            self._ring_count += 1
+        if self._stats is not None:
+            self._stats["adc_reads"] += 1
+
+    def _last(self, count):
+        """Start index and number of the last count samples."""
+
+        if count is None or count > self._ring_count:
+            count = self._ring_count
+        if count == 0:
+            raise CO2_sensor_not_ready("No samples yet, call start()")
+        return ((self._ring_index - count) % len(self._ring), count)
+
+    def _not_ready(self):
+        if self._stats is not None:
+            self._stats["sensor_not_ready"] += 1
+        raise CO2_sensor_not_ready("Co2 sensor not ready")
+
+    def read_latest(self):
+        """Get the newest sample, returns whole ppm"""
+
+        start, count = self._last(1)
+        ppm = self._table[self._ring[start]]
+        if ppm == 0:
+            self._not_ready()
+        return (ppm)
+
+    def read_average(self, count=None):
+        """Get the average of the last count samples, all by default
+
+        Samples taken while the sensor was not ready are left out.
+
+        """
+
+        start, count = self._last(count)
+        ring = self._ring
+        table = self._table
+        size = len(ring)
+        total = 0
+        used = 0
+        for n in range(count):
+            ppm = table[ring[(start + n) % size]]
+            if ppm:
+                total += ppm
+                used += 1
+        if used == 0:
+            self._not_ready()
+        return (total / used)
+
+    def read_trend(self, count=None):
+        """Get how fast Co2 is changing over the last count samples
+
+        A least squares line through the samples, all by default.
+        Samples taken while the sensor was not ready are left out.
+
+        Returns:
+        float -- change in ppm per minute
+
+        """
+
+        start, count = self._last(count)
+        ring = self._ring
+        table = self._table
+        size = len(ring)
+        # Integer sums, one division at the end
+        used = sum_x = sum_y = sum_xx = sum_xy = 0
+        for x in range(count):
+            y = table[ring[(start + x) % size]]
+            if y:
+                used += 1
+                sum_x += x
+                sum_y += y
+                sum_xx += x * x
+                sum_xy += x * y
+        spread = used * sum_xx - sum_x * sum_x
+        if spread == 0:
+            self._not_ready()
+        return ((used * sum_xy - sum_x * sum_y) / spread * self.rate * 60)
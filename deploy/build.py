@@ -0,0 +1,88 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Precompile the drivers and package to .mpy for a device
+
+import os
+import subprocess
+import sys
+
+"""Build, compile everything in manifest.py with mpy-cross
+
+Runs on a PC with CPython and mpy-cross (pip install mpy-cross):
+python3 deploy/build.py [output directory] [mpy-cross arguments]
+
+The output, deploy/build/lib by default, is copied to /lib on the
+device. Compiled modules load without parsing, which is faster and
+needs less RAM than importing the .py files.
+
+Exported functions:
+read_manifest -- List the files manifest.py freezes
+build -- Compile them to .mpy
+main -- Build from the command line
+
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(HERE, "manifest.py")
+
+
+def read_manifest(manifest=MANIFEST):
+    """List the files a manifest freezes.
+
+    Only module() and package() are followed, include() pulls in the
+    firmware's own modules and is skipped.
+
+    Returns:
+    list -- (source path, path on the device) tuples
+
+    """
+
+    base = os.path.dirname(manifest)
+    files = []
+
+    def module(module_path, base_path="."):
+        source = os.path.normpath(os.path.join(base, base_path, module_path))
+        files.append((source, module_path))
+
+    def package(package_path, base_path="."):
+        root = os.path.normpath(os.path.join(base, base_path))
+        for path, _, names in sorted(os.walk(os.path.join(root,
+                                                          package_path))):
+            for name in sorted(names):
+                if name.endswith(".py"):
+                    source = os.path.join(path, name)
+                    files.append((source, os.path.relpath(source, root)))
+
+    def include(manifest_path):
+        pass
+
+    with open(manifest) as manifest_file:
+        code = manifest_file.read()
+    exec(code, {"module": module, "package": package, "include": include})
+    return (files)
+
+
+def build(output, mpy_cross="mpy-cross", arguments=()):
+    """Compile every file in the manifest into output, returns the paths"""
+
+    built = []
+    for source, target in read_manifest():
+        target = os.path.join(output, target[:-3] + ".mpy")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        subprocess.check_call([mpy_cross] + list(arguments) +
+                              ["-o", target, source])
+        built.append(target)
+    return (built)
+
+
+def main(argv):
+    output = os.path.join(HERE, "build", "lib")
+    if argv and not argv[0].startswith("-"):
+        output = argv.pop(0)
+    for target in build(output, arguments=argv):
+        print("{0:48} {1:6} bytes".format(os.path.relpath(target),
+                                          os.path.getsize(target)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,31 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Freeze the drivers and the esp32_modules package
+
+# Build micropython with FROZEN_MANIFEST pointing at this file, or run
+# deploy/build.py to precompile everything to .mpy instead.
+# Paths are relative to this file. The bme680 and i2c modules come from
+# the bme680 library and must be frozen or copied separately.
+# include(), package() and module() are provided by makemanifest.
+# flake8: noqa
+
+include("$(PORT_DIR)/boards/manifest.py")
+
+package("esp32_modules", base_path="..")
+
+module("bme680_wrapper.py", base_path="../bme680")
+module("CO2.py", base_path="../co2")
+module("driver_stats.py", base_path="../driver_stats")
+module("duty_cycle.py", base_path="../duty_cycle")
+module("i2c_bus.py", base_path="../i2c_bus")
+module("pm25.py", base_path="../pm25")
+module("pm25_monitor.py", base_path="../pm25")
+module("sample_log.py", base_path="../sample_log")
+module("scheduler.py", base_path="../scheduler")
+module("telemetry.py", base_path="../telemetry")
+module("timeseries.py", base_path="../timeseries")
+module("eink.py", base_path="../waveshare-e-ink-4in3")
+module("eink_async.py", base_path="../waveshare-e-ink-4in3")
+module("eink_graph.py", base_path="../waveshare-e-ink-4in3")
+module("eink_layout.py", base_path="../waveshare-e-ink-4in3")
+module("wifi_setup.py", base_path="../wifi_setup")
@@ -0,0 +1,36 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : The enable_stats() and stats() methods every driver shares
+
+"""Driver stats, the common counters API of the drivers
+
+A driver class lists its counters in _STAT_NAMES and sets _stats to
+None in __init__. Counting sites check "if self._stats is not None:"
+first, so counting costs nothing while it is off.
+
+Exported class's:
+Driver_stats -- Mixin adding enable_stats() and stats()
+
+"""
+
+
+class Driver_stats:
+    # Counters kept by enable_stats(), set by each driver
+    _STAT_NAMES = ()
+    # Counters, None while counting is off
+    _stats = None
+
+    def enable_stats(self, enable=True):
+        """Start counting from zero, or stop counting if enable is False"""
+
+        if enable:
+            self._stats = dict.fromkeys(self._STAT_NAMES, 0)
+        else:
+            self._stats = None
+
+    def stats(self):
+        """Get the counters, returns a dict, empty while counting is off"""
+
+        if self._stats is None:
+            return ({})
+        return (dict(self._stats))
@@ -0,0 +1,203 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Wake, sample and deep sleep, keeping state in RTC memory
+
+import json
+import machine
+import struct
+from time import time, ticks_ms, ticks_diff
+from sample_log import RECORD, RECORD_SIZE, CHANNELS
+
+"""Duty cycle runner for battery nodes
+
+Driver state, the WiFi access point and samples not yet sent are kept
+in RTC memory across deep sleep, so a warm wake skips the handshakes,
+scans and redraws a cold boot needs.
+
+Exported class's:
+Duty_cycle -- Keep state across deep sleep and sleep between samples
+
+"""
+
+# RTC memory: magic, state length, sample count, JSON state, samples
+# packed like the sample log
+_MAGIC = b"DC"
+_HEADER = "<2sHH"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+# esp32 RTC user memory size
+RTC_MEMORY_SIZE = 2048
+
+
+class Duty_cycle_unknown_channel(Exception):
+    pass
+
+
+class Duty_cycle:
+    def __init__(self, interval, max_samples=100, channels=CHANNELS):
+        """Load the state kept by the last sleep, if this is a warm wake
+
+        Create the runner first thing in main.py, the awake time is
+        measured from here.
+
+        Keyword arguments:
+        interval -- seconds from one wake to the next
+        max_samples -- samples kept until they are sent, the oldest are
+                       dropped past this
+        channels -- channel names, their index is kept with each sample
+
+
+        """
+
+        self._woke = ticks_ms()
+        self.interval = interval
+        self.channels = channels
+        self._max_samples = max_samples
+        self._drivers = {}
+        self.state = {}
+        self._samples = bytearray()
+
+        self.rtc = machine.RTC()
+        self.warm = False
+        if machine.reset_cause() == machine.DEEPSLEEP_RESET:
+            self.warm = self._load()
+        # wakes, warm wakes, total ms awake, ms awake last wake, samples
+        # dropped
+        self._cycle = self.state.get("_cycle", [0, 0, 0, 0, 0])
+        self._cycle[0] += 1
+        if self.warm:
+            self._cycle[1] += 1
+
+    def _load(self):
+        """Unpack RTC memory, returns False if it holds nothing valid."""
+
+        data = self.rtc.memory()
+        if len(data) < _HEADER_SIZE:
+            return (False)
+        magic, length, count = struct.unpack_from(_HEADER, data)
+        end = _HEADER_SIZE + length
+        if magic != _MAGIC or end + count * RECORD_SIZE > len(data):
+            return (False)
+        try:
+            self.state = json.loads(data[_HEADER_SIZE:end])
+        except ValueError:
+            return (False)
+        self._samples = bytearray(data[end:end + count * RECORD_SIZE])
+        return (True)
+
+    def attach(self, name, driver):
+        """Keep a driver's state across deep sleep, returns the driver
+
+        On a warm wake the state saved before the last sleep is loaded
+        with driver.load_state(). Before sleeping driver.save_state() is
+        kept.
+
+        Keyword arguments:
+        name -- name the state is kept under, must be unique
+        driver -- object with save_state() and load_state() methods
+
+
+        """
+
+        self._drivers[name] = driver
+        if self.warm and name in self.state:
+            driver.load_state(self.state[name])
+        return (driver)
+
+    def add(self, name, value, now=None):
+        """Keep a sample until it is sent, across deep sleep"""
+
+        try:
+            channel = self.channels.index(name)
+        except ValueError:
+            raise Duty_cycle_unknown_channel("Unknown channel {0}".format(
+                name))
+        if now is None:
+            now = int(time())
+        if len(self._samples) >= self._max_samples * RECORD_SIZE:
+            self._samples = self._samples[RECORD_SIZE:]
+            self._cycle[4] += 1
+        self._samples.extend(struct.pack(RECORD, now, channel, value))
+
+    def samples(self):
+        """Get the kept samples, oldest first, as (time, name, value)"""
+
+        result = []
+        for offset in range(0, len(self._samples), RECORD_SIZE):
+            now, channel, value = struct.unpack_from(RECORD, self._samples,
+                                                     offset)
+            result.append((now, self.channels[channel], value))
+        return (result)
+
+    def clear(self):
+        """Forget the kept samples, once they have been sent"""
+
+        self._samples = bytearray()
+
+    def awake_ms(self):
+        """Milliseconds since the runner was created"""
+
+        return (ticks_diff(ticks_ms(), self._woke))
+
+    def stats(self):
+        """Get the wake counters, returns a dict"""
+
+        return ({"wakes": self._cycle[0], "warm_wakes": self._cycle[1],
+                 "awake_ms": self._cycle[2],
+                 "last_awake_ms": self._cycle[3],
+                 "samples_dropped": self._cycle[4],
+                 "samples": len(self._samples) // RECORD_SIZE})
+
+    def save(self):
+        """Write the state and samples to RTC memory
+
+        Called by sleep(). If they do not fit the oldest samples are
+        dropped, counted in samples_dropped. If the driver state alone
+        does not fit nothing is kept, and the next wake is a cold one.
+
+        Returns:
+        bool -- True if the state was kept
+
+        """
+
+        for name, driver in self._drivers.items():
+            self.state[name] = driver.save_state()
+        while True:
+            self.state["_cycle"] = self._cycle
+            state = json.dumps(self.state).encode()
+            room = RTC_MEMORY_SIZE - _HEADER_SIZE - len(state)
+            if room < 0:
+                self.rtc.memory(b"")
+                return (False)
+            drop = len(self._samples) - room // RECORD_SIZE * RECORD_SIZE
+            if drop <= 0:
+                break
+            # Dropping changes the counter in the state, so go round again
+            self._samples = self._samples[drop:]
+            self._cycle[4] += drop // RECORD_SIZE
+        count = len(self._samples) // RECORD_SIZE
+        self.rtc.memory(struct.pack(_HEADER, _MAGIC, len(state), count) +
+                        state + self._samples)
+        return (True)
+
+    def sleep(self):
+        """Save the state and deep sleep until the next wake is due
+
+        Sleeps for the interval less the time spent awake, so wakes stay
+        interval seconds apart. Does not return, the ESP32 resets on
+        waking. It always sleeps. If saving the state fails RTC memory
+        is cleared, and the next wake is a cold one.
+
+
+        """
+
+        awake = self.awake_ms()
+        self._cycle[2] += awake
+        self._cycle[3] = awake
+        try:
+            self.save()
+        except Exception as error:
+            # The last sleep's state would be loaded on the next wake,
+            # sending its samples again, so wake cold instead
+            print("Duty cycle state not saved:", error)
+            self.rtc.memory(b"")
+        machine.deepsleep(max(self.interval * 1000 - self.awake_ms(), 1))
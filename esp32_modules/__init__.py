@@ -0,0 +1,96 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Lazy access to every driver, and node profiles
+
+"""ESP32 modules package, imports a driver only when it is first used
+
+A node only pays the import time and RAM of the drivers it touches:
+esp32_modules.pm25 imports pm25 on first use, nothing is imported when
+the package is.
+
+Exported functions:
+load -- Import a driver module by name
+start -- Set up the drivers a node profile uses
+
+"""
+
+# Names the drivers are reached by, and the module each one is in
+MODULES = {
+    "bme680": "bme680_wrapper",
+    "co2": "CO2",
+    "duty_cycle": "duty_cycle",
+    "eink": "eink",
+    "eink_async": "eink_async",
+    "eink_graph": "eink_graph",
+    "eink_layout": "eink_layout",
+    "i2c_bus": "i2c_bus",
+    "pm25": "pm25",
+    "pm25_monitor": "pm25_monitor",
+    "sample_log": "sample_log",
+    "scheduler": "scheduler",
+    "telemetry": "telemetry",
+    "timeseries": "timeseries",
+    "wifi": "wifi_setup",
+}
+
+
+class Unknown_driver(Exception):
+    pass
+
+
+def load(name):
+    """Import a driver module by name, returns the module
+
+    Keyword arguments:
+    name -- one of the names in MODULES, such as "pm25"
+
+
+    """
+
+    try:
+        module_name = MODULES[name]
+    except KeyError:
+        raise Unknown_driver("Unknown driver {0}".format(name))
+    module = __import__(module_name)
+    # Later lookups find the module without calling __getattr__ again
+    globals()[name] = module
+    return (module)
+
+
+def __getattr__(name):
+    if name not in MODULES:
+        raise AttributeError(name)
+    return (load(name))
+
+
+def start(profile):
+    """Set up the drivers a node profile uses, importing only those
+
+    Keyword arguments:
+    profile -- name of a profile in esp32_modules.profiles, a path to a
+               JSON file, or a dict, each entry being
+               name: {"driver": ..., "class": ..., "args": [...],
+                      "kwargs": {...}}
+
+    Returns:
+    dict -- name: driver object, one for each entry of the profile
+
+
+    """
+
+    if isinstance(profile, str):
+        if profile.endswith(".json"):
+            import json
+            with open(profile) as profile_file:
+                profile = json.load(profile_file)
+        else:
+            from esp32_modules.profiles import PROFILES
+            profile = PROFILES[profile]
+
+    drivers = {}
+    for name, entry in profile.items():
+        module = load(entry["driver"])
+        driver_class = getattr(module, entry["class"])
+        drivers[name] = driver_class(*entry.get("args", ()),
+                                     **entry.get("kwargs", {}))
+    return (drivers)
@@ -0,0 +1,45 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Node profiles, the drivers each kind of node uses
+
+"""Node profiles for esp32_modules.start()
+
+Each profile maps a name to the driver, class and constructor arguments
+of one device. "read" names the method giving a reading, it is used to
+time the first reading.
+
+Exported values:
+PROFILES -- profile name: profile
+
+"""
+
+PROFILES = {
+    # PM2.5 sensor on UART 1 and the e-ink display on UART 2, the two
+    # can not share a hardware UART
+    "air": {
+        "pm25": {"driver": "pm25", "class": "PM25_sensor",
+                 "args": [25, 26], "read": "read_sensor"},
+        "display": {"driver": "eink", "class": "EINK_display",
+                    "args": [16, 17], "kwargs": {"uart_id": 2},
+                    "read": "hand_shake"},
+    },
+    "climate": {
+        "bme680": {"driver": "bme680", "class": "BME680_sensor",
+                   "args": [22, 21], "read": "read_all"},
+    },
+    "co2": {
+        "co2": {"driver": "co2", "class": "CO2_sensor",
+                "args": [36], "read": "read_burst"},
+    },
+    "full": {
+        "pm25": {"driver": "pm25", "class": "PM25_sensor",
+                 "args": [25, 26], "read": "read_sensor"},
+        "bme680": {"driver": "bme680", "class": "BME680_sensor",
+                   "args": [22, 21], "read": "read_all"},
+        "co2": {"driver": "co2", "class": "CO2_sensor",
+                "args": [36], "read": "read_burst"},
+        "display": {"driver": "eink", "class": "EINK_display",
+                    "args": [16, 17], "kwargs": {"uart_id": 2},
+                    "read": "hand_shake"},
+    },
+}
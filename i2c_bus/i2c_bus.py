@@ -0,0 +1,250 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Share one I2C bus per pin pair between several sensors
+
+import machine
+from i2c import I2CAdapter
+from driver_stats import Driver_stats
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+"""I2C bus manager, one shared bus per pin pair with serialized access
+
+Exported class's:
+I2C_bus -- Shared bus, usable as the bme680 library i2c_device
+I2C_burst -- Several register reads done in one pass over the bus
+
+Exported functions:
+get_bus -- Get the shared bus for a pin pair, creating it once
+
+"""
+
+
+class I2C_bus_pin_in_use(Exception):
+    pass
+
+
+class _No_lock:
+    """Stands in for a lock when there are no threads."""
+
+    def acquire(self):
+        return (True)
+
+    def release(self):
+        pass
+
+
+if _thread is None:
+    _allocate_lock = _No_lock
+
+    def _get_ident():
+        return (0)
+else:
+    _allocate_lock = _thread.allocate_lock
+    _get_ident = _thread.get_ident
+
+
+class I2C_bus(Driver_stats):
+    def __init__(self, scl_pin, sda_pin, freq=400000):
+        """Set up the bus, use get_bus() instead of calling this
+
+        Keyword arguments:
+        scl_pin -- pin number of the I2C Serial Clock line
+        sda_pin -- pin number of the I2C Serial Data line
+        freq -- bus clock in Hz
+
+
+        """
+
+        self.pins = (scl_pin, sda_pin)
+        self.i2c = I2CAdapter(scl=machine.Pin(scl_pin),
+                              sda=machine.Pin(sda_pin), freq=freq)
+        # Held for a whole transaction, taken again by the same thread
+        # without blocking
+        self._lock = _allocate_lock()
+        self._owner = None
+        self._depth = 0
+        # Counters, None while counting is off
+        self._stats = None
+
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("transactions", "bytes_read", "bytes_written", "errors")
+
+    def __enter__(self):
+        """Take the bus, nothing else can use it until the with ends"""
+
+        me = _get_ident()
+        if self._owner != me:
+            self._lock.acquire()
+            self._owner = me
+        self._depth += 1
+        return (self)
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._lock.release()
+
+    def _count(self, read, written):
+        stats = self._stats
+        stats["transactions"] += 1
+        stats["bytes_read"] += read
+        stats["bytes_written"] += written
+
+    def readfrom_mem_into(self, address, register, buffer):
+        """Read len(buffer) bytes from a device register into buffer"""
+
+        with self:
+            try:
+                self.i2c.readfrom_mem_into(address, register, buffer)
+            except OSError:
+                if self._stats is not None:
+                    self._stats["errors"] += 1
+                raise
+        if self._stats is not None:
+            self._count(len(buffer), 0)
+
+    def readfrom_mem(self, address, register, length):
+        """Read length bytes from a device register, returns bytes"""
+
+        buffer = bytearray(length)
+        self.readfrom_mem_into(address, register, buffer)
+        return (bytes(buffer))
+
+    def writeto_mem(self, address, register, data):
+        """Write bytes to a device register"""
+
+        with self:
+            try:
+                self.i2c.writeto_mem(address, register, data)
+            except OSError:
+                if self._stats is not None:
+                    self._stats["errors"] += 1
+                raise
+        if self._stats is not None:
+            self._count(0, len(data))
+
+    # The methods the bme680 library calls on its i2c_device
+
+    def read_byte_data(self, address, register):
+        return (self.readfrom_mem(address, register, 1)[0])
+
+    def read_i2c_block_data(self, address, register, length):
+        return (self.readfrom_mem(address, register, length))
+
+    def write_byte_data(self, address, register, data):
+        self.writeto_mem(address, register, bytes([data]))
+
+    def write_i2c_block_data(self, address, register, data):
+        self.writeto_mem(address, register, bytes(data))
+
+    def scan(self):
+        """List the addresses that answer on the bus"""
+
+        with self:
+            return (self.i2c.scan())
+
+    def burst(self, reads):
+        """Set up an I2C_burst of register reads on this bus
+
+        Keyword arguments:
+        reads -- (address, register, length) tuples
+
+
+        """
+
+        return (I2C_burst(self, reads))
+
+
+class I2C_burst:
+    def __init__(self, bus, reads):
+        """Plan a set of register reads, use I2C_bus.burst() instead
+
+        Reads of the same device whose registers touch or overlap are
+        merged into one transaction. Buffers are allocated here, so
+        read() does not allocate.
+
+        Keyword arguments:
+        bus -- I2C_bus to read from
+        reads -- (address, register, length) tuples
+
+
+        """
+
+        self.bus = bus
+        # Merged spans: [address, first register, end register]
+        spans = []
+        for address, register, length in sorted(reads):
+            last = spans[-1] if spans else None
+            if last is not None and last[0] == address and \
+                    register <= last[2]:
+                last[2] = max(last[2], register + length)
+            else:
+                spans.append([address, register, register + length])
+        self._spans = [(address, first, bytearray(end - first))
+                       for address, first, end in spans]
+
+        # One view per read, in the order given, into its span's buffer
+        self.results = []
+        for address, register, length in reads:
+            for span_address, first, buffer in self._spans:
+                if span_address == address and \
+                        first <= register < first + len(buffer):
+                    start = register - first
+                    self.results.append(
+                        memoryview(buffer)[start:start + length])
+                    break
+
+    def transactions(self):
+        """Number of bus transactions each read() takes"""
+
+        return (len(self._spans))
+
+    def read(self):
+        """Do every read, holding the bus for the whole pass
+
+        Returns:
+        list -- a memoryview per read, in the order given, overwritten
+                by the next read()
+
+        """
+
+        bus = self.bus
+        with bus:
+            for address, register, buffer in self._spans:
+                bus.readfrom_mem_into(address, register, buffer)
+        return (self.results)
+
+
+# Shared buses, keyed by (scl_pin, sda_pin)
+_buses = {}
+
+
+def get_bus(scl_pin, sda_pin, freq=400000):
+    """Get the shared bus for a pin pair, creating it on first use.
+
+    The clock set by the first caller is kept.
+
+    Keyword arguments:
+    scl_pin -- pin number of the I2C Serial Clock line
+    sda_pin -- pin number of the I2C Serial Data line
+    freq -- bus clock in Hz
+
+
+    """
+
+    key = (scl_pin, sda_pin)
+    bus = _buses.get(key)
+    if bus is not None:
+        return (bus)
+    for pins in _buses:
+        if scl_pin in pins or sda_pin in pins:
+            raise I2C_bus_pin_in_use("Pin used by the bus on pins {0}"
+                                     .format(pins))
+    bus = I2C_bus(scl_pin, sda_pin, freq)
+    _buses[key] = bus
+    return (bus)
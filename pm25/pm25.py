@@ -4,6 +4,8 @@
 
 import struct
 from machine import UART
+from driver_stats import Driver_stats
+from time import sleep_ms, ticks_ms, ticks_diff
 
 
 """PM2.5 sensor, read the three pm values from the sensor
@@ -11,57 +13,161 @@ from machine import UART
 Exported class's:
 PM25Base -- Used to Initialize the sensor
 PM25_sensor -- Get the three PM values (1.0, 2.5, 10um)
+              or every decoded frame from frames()
 
 """
 
 
-class PM25_serial_not_ready:
+class PM25_serial_not_ready(Exception):
     pass
 
 
-class PM25Base:
-    def __init__(self, rx_pin, tx_pin):
+class PM25Base(Driver_stats):
+    def __init__(self, rx_pin, tx_pin, uart_id=1):
         """Initialize the sensor.
 
         Keyword arguments:
         rx_pin -- pin number of the rx pin
         tx_pin -- pin number of the tx pin
+        uart_id -- hardware UART to use, each device needs its own
 
 
         """
 
         # Set up the serial port according to the sensor docs
-        uart = UART(1, 9600, timeout=0)
+        uart = UART(uart_id, 9600, timeout=0)
         uart.init(9600, bits=8, parity=None, stop=1, rx=rx_pin, tx=tx_pin)
         self.uart = uart
 
+        # Counters, None while counting is off
+        self._stats = None
+
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("uart_bytes_in", "frames", "parse_failures",
+                   "bytes_discarded", "sleep_ms", "serial_not_ready")
+
 
 class PM25_sensor(PM25Base):
-    def read_sensor(self):
+    # See the data sheet, every frame is 32 bytes and starts 0x42 0x4D
+    _FRAME_START = 0x42
+    _FRAME_START_2 = 0x4D
+    _FRAME_SIZE = 32
+    # The frame length field, 13 data words and the checksum
+    _FRAME_LENGTH = 28
+    # Offset of the checksum, the sum of every byte before it
+    _FRAME_CHECKSUM = 30
+    _FRAME_DATA = ">13H"
+
+    def __init__(self, rx_pin, tx_pin, uart_id=1):
+        super().__init__(rx_pin, tx_pin, uart_id)
+
+        # Bytes read from the UART but not parsed yet, room for four frames
+        self._buffer = bytearray(4 * self._FRAME_SIZE)
+        self._view = memoryview(self._buffer)
+        self._fill = 0
+
+    def _read_uart(self):
+        """Read whatever the UART has waiting into the free buffer space."""
+
+        if self._fill < len(self._buffer):
+            count = self.uart.readinto(self._view[self._fill:])
+            if count:
+                self._fill += count
+                if self._stats is not None:
+                    self._stats["uart_bytes_in"] += count
+
+    def _consume(self, count):
+        """Drop count bytes from the front of the buffer."""
+
+        remaining = self._fill - count
+        self._buffer[:remaining] = self._view[count:self._fill]
+        self._fill = remaining
+
+    def _frame_valid(self):
+        """Check the length and checksum of the frame at the buffer start."""
+
+        buffer = self._buffer
+        if (buffer[2] << 8 | buffer[3]) != self._FRAME_LENGTH:
+            return (False)
+        checksum = 0
+        for i in range(self._FRAME_CHECKSUM):
+            checksum += buffer[i]
+        return (checksum == (buffer[self._FRAME_CHECKSUM] << 8 |
+                             buffer[self._FRAME_CHECKSUM + 1]))
+
+    def _next_frame(self):
+        """Parse the next valid frame in the buffer, returns None if none."""
+
+        buffer = self._buffer
+        while True:
+            # Skip anything that can't be the start of a frame
+            start = 0
+            while start < self._fill - 1 and not (
+                    buffer[start] == self._FRAME_START and
+                    buffer[start + 1] == self._FRAME_START_2):
+                start += 1
+            if start == self._fill - 1 and buffer[start] != self._FRAME_START:
+                start += 1
+            if start:
+                self._consume(start)
+                if self._stats is not None:
+                    self._stats["bytes_discarded"] += start
+
+            if self._fill < self._FRAME_SIZE:
+                return (None)
+            if self._frame_valid():
+                data = struct.unpack_from(self._FRAME_DATA, buffer, 4)
+                self._consume(self._FRAME_SIZE)
+                if self._stats is not None:
+                    self._stats["frames"] += 1
+                return (data)
+            # Bad frame, search again from the next byte
+            self._consume(1)
+            if self._stats is not None:
+                self._stats["parse_failures"] += 1
+                self._stats["bytes_discarded"] += 1
+
+    def frames(self):
+        """Yield every frame received so far, oldest first.
+
+        Does not wait for the sensor, stops when no complete frame is left.
+        Each frame is a tuple of the 13 data words from the data sheet,
+        the first three are pm1, pm2 and pm10.
+
+        """
+
+        while True:
+            self._read_uart()
+            data = self._next_frame()
+            if data is None:
+                return
+            yield data
+
+    def read_sensor(self, timeout=2):
         """Read the serial line data till we find the data.
 
+        Keyword arguments:
+        timeout -- seconds to wait for a frame, the sensor sends one a
+                   second. Fractions of a second work too
+
         Returns:
-        tuple -- pm1, pm2, pm10
+        tuple -- pm1, pm2, pm10 from the newest frame
 
         """
 
-        test_serial = self.uart.read(1)
-        if len(test_serial) == 0:
-            byte, lastbyte = str.encode("\x00"), str.encode("\x00")
-        else:
-            raise PM25_serial_not_ready("can't read UART data")
-
+        data = None
+        start = ticks_ms()
         while True:
-            lastbyte = byte
-            byte = self.uart.read(1)
-            # Start characters are 0x42 followed by 0x4d
-            if lastbyte == str.encode("\x42") and byte == str.encode("\x4d"):
-                # unpack 13 ints of data
-                raw_data = self.uart.read(31)
-                data = struct.unpack(">hhhhhhhhhhhhhhh", raw_data)
-
-            # First, second and third bytes should be the sensor readings
-            pm1 = data[1]
-            pm2 = data[2]
-            pm10 = data[3]
-            return (pm1, pm2, pm10)
+            for data in self.frames():
+                pass
+            if data is not None:
+                # First, second and third words are the sensor readings
+                return (data[0], data[1], data[2])
+            if ticks_diff(ticks_ms(), start) >= timeout * 1000:
+                break
+            sleep_ms(100)
+            if self._stats is not None:
+                self._stats["sleep_ms"] += 100
+        if self._stats is not None:
+            self._stats["serial_not_ready"] += 1
+        raise PM25_serial_not_ready("can't read UART data")
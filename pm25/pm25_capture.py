@@ -0,0 +1,175 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Decode captured PM2.5 sensor UART streams in bulk
+
+import mmap
+import sys
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""PM2.5 capture decoder, runs on a PC with CPython and NumPy
+
+Decodes raw UART dumps of the sensor with NumPy, every frame in a chunk
+is found, checked and decoded at once instead of one at a time.
+
+Exported functions:
+decode -- Decode the frames in a buffer into columns
+decode_file -- Decode a capture file, memory mapped
+main -- Print a summary of capture files
+
+"""
+
+# Same frame layout as PM25_sensor, see the data sheet
+FRAME_SIZE = 32
+FRAME_LENGTH = 28
+FRAME_CHECKSUM = 30
+
+# The 13 data words of a frame, in order
+FIELDS = ("pm1_0", "pm2_5", "pm10",
+          "pm1_0_atm", "pm2_5_atm", "pm10_atm",
+          "count_0_3", "count_0_5", "count_1_0", "count_2_5", "count_5_0",
+          "count_10", "reserved")
+
+# Bytes decoded at a time, bounds the memory used on large captures
+CHUNK_SIZE = 1 << 24
+
+# Keys of the counts filled in by decode() and decode_file()
+COUNTS = ("headers", "bad_length", "bad_checksum", "overlapping", "frames")
+
+
+def _empty():
+    """Columns holding no frames."""
+
+    columns = {"offset": numpy.empty(0, dtype=numpy.int64)}
+    for name in FIELDS:
+        columns[name] = numpy.empty(0, dtype=numpy.uint16)
+    return (columns)
+
+
+def decode(data, base=0, counts=None):
+    """Decode every valid frame in a buffer.
+
+    Keyword arguments:
+    data -- bytes, bytearray, mmap or uint8 array holding the stream
+    base -- offset of data in the capture, added to the frame offsets
+    counts -- dict the COUNTS are added to, or None
+
+    Returns:
+    dict -- "offset" and each of FIELDS, NumPy arrays with one entry per
+            frame, oldest first
+
+    """
+
+    if not isinstance(data, numpy.ndarray):
+        data = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(data) < FRAME_SIZE:
+        return (_empty())
+
+    # Every 0x42 0x4D pair with room for a whole frame after it
+    last = len(data) - FRAME_SIZE + 1
+    starts = numpy.flatnonzero((data[:last] == 0x42) &
+                               (data[1:last + 1] == 0x4D))
+    # Copy each candidate frame into a row, without an index array
+    frames = sliding_window_view(data, FRAME_SIZE)[starts]
+
+    length = frames[:, 2].astype(numpy.uint16) << 8 | frames[:, 3]
+    good_length = length == FRAME_LENGTH
+    checksum = frames[:, :FRAME_CHECKSUM].sum(axis=1, dtype=numpy.uint32)
+    expected = frames[:, FRAME_CHECKSUM].astype(numpy.uint32) << 8 | \
+        frames[:, FRAME_CHECKSUM + 1]
+    valid = good_length & (checksum == expected)
+    frames = frames[valid]
+    starts = starts[valid]
+
+    # A header inside a kept frame is data, the device parser skips
+    # past it too. Done in order, a frame dropped this way does not
+    # hide the ones after it.
+    keep = numpy.zeros(len(starts), dtype=bool)
+    next_start = 0
+    for i, start in enumerate(starts.tolist()):
+        if start >= next_start:
+            keep[i] = True
+            next_start = start + FRAME_SIZE
+    frames = frames[keep]
+    starts = starts[keep]
+
+    if counts is not None:
+        for name, count in (
+                ("headers", len(good_length)),
+                ("bad_length", len(good_length) - int(good_length.sum())),
+                ("bad_checksum", int(good_length.sum()) - len(keep)),
+                ("overlapping", len(keep) - len(starts)),
+                ("frames", len(starts))):
+            counts[name] = counts.get(name, 0) + count
+
+    # Big endian words, rows are contiguous so view them in place
+    words = numpy.ascontiguousarray(frames[:, 4:FRAME_CHECKSUM]).view(
+        ">u2").astype(numpy.uint16)
+    columns = {"offset": starts.astype(numpy.int64) + base}
+    for i, name in enumerate(FIELDS):
+        columns[name] = words[:, i]
+    return (columns)
+
+
+def decode_file(file_name, counts=None, chunk_size=CHUNK_SIZE):
+    """Decode every valid frame in a capture file.
+
+    The file is memory mapped and decoded chunk_size bytes at a time.
+
+    Keyword arguments:
+    file_name -- path of the raw UART capture
+    counts -- dict the COUNTS are added to, or None
+    chunk_size -- bytes decoded at a time
+
+    Returns:
+    dict -- same as decode()
+
+    """
+
+    with open(file_name, "rb") as capture:
+        try:
+            data = mmap.mmap(capture.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            return (_empty())
+        with data:
+            stream = numpy.frombuffer(data, dtype=numpy.uint8)
+            parts = []
+            end = 0
+            for start in range(0, len(stream), chunk_size):
+                # Frames may start in the last FRAME_SIZE - 1 bytes of a
+                # chunk, so read that far into the next one. Frames
+                # starting before the last one ended are skipped.
+                chunk = stream[max(start, end):
+                               start + chunk_size + FRAME_SIZE - 1]
+                start = max(start, end)
+                columns = decode(chunk, start, counts)
+                offsets = columns["offset"]
+                if len(offsets):
+                    end = int(offsets[-1]) + FRAME_SIZE
+                parts.append(columns)
+            # The mmap can't close while arrays still point into it
+            del stream, chunk
+
+    if not parts:
+        return (_empty())
+    return ({name: numpy.concatenate([part[name] for part in parts])
+             for name in parts[0]})
+
+
+def main(file_names):
+    """Print the frame counts and pm 2.5 summary of capture files"""
+
+    for file_name in file_names:
+        counts = {}
+        columns = decode_file(file_name, counts)
+        print("{0}: {1}".format(file_name, ", ".join(
+            "{0} {1}".format(name, counts.get(name, 0)) for name in COUNTS)))
+        pm2_5 = columns["pm2_5"]
+        if len(pm2_5):
+            print("{0}: pm2.5 min {1} mean {2:.1f} max {3}".format(
+                file_name, pm2_5.min(), pm2_5.mean(), pm2_5.max()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,164 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Read the DF robot HK-A5 Laser PM2.5 sensor in the background
+
+from array import array
+from time import time
+import uasyncio
+from pm25 import PM25_sensor, PM25_serial_not_ready
+
+"""PM2.5 monitor, keeps the latest and average pm values in memory
+
+Exported class's:
+Rolling_average -- Fixed memory average over a time window
+PM25_monitor -- Read the sensor in the background
+
+"""
+
+
+class PM25_invalid_window(Exception):
+    pass
+
+
+class Rolling_average:
+    def __init__(self, window, buckets):
+        """Set up an average over the last window seconds.
+
+        Keyword arguments:
+        window -- length of the window in seconds
+        buckets -- number of slots the window is split into, old values
+                   drop out of the average one slot at a time
+
+
+        """
+
+        self.bucket_seconds = window // buckets
+        self._sums = array('f', [0] * buckets)
+        self._counts = array('H', [0] * buckets)
+        # Bucket number (time divided by bucket length) last written to
+        self._bucket = None
+
+    def _advance(self, now):
+        """Empty any slots that have fallen out of the window."""
+
+        bucket = now // self.bucket_seconds
+        if bucket == self._bucket:
+            return
+        buckets = len(self._sums)
+        if self._bucket is None or bucket - self._bucket >= buckets:
+            first = bucket - buckets + 1
+        else:
+            first = self._bucket + 1
+        for i in range(first, bucket + 1):
+            self._sums[i % buckets] = 0
+            self._counts[i % buckets] = 0
+        self._bucket = bucket
+
+    def add(self, value, now):
+        """Add a value read at time now (seconds)."""
+
+        self._advance(now)
+        i = self._bucket % len(self._sums)
+        self._sums[i] += value
+        self._counts[i] += 1
+
+    def average(self, now):
+        """Average of the values in the window, None if there are none."""
+
+        self._advance(now)
+        count = sum(self._counts)
+        if count == 0:
+            return (None)
+        return (sum(self._sums) / count)
+
+
+class PM25_monitor(PM25_sensor):
+    # Averaging windows in seconds and the slots they are split into
+    _WINDOWS = {60: 12, 900: 15, 3600: 12}
+
+    def __init__(self, rx_pin, tx_pin, uart_id=1):
+        """Initialize the sensor.
+
+        Keyword arguments:
+        rx_pin -- pin number of the rx pin
+        tx_pin -- pin number of the tx pin
+        uart_id -- hardware UART to use, each device needs its own
+
+
+        """
+
+        super().__init__(rx_pin, tx_pin, uart_id)
+        self.latest = None
+        self.updated = None
+        # One average for each of pm1, pm2 and pm10 per window
+        self._averages = {}
+        for window, buckets in self._WINDOWS.items():
+            self._averages[window] = (Rolling_average(window, buckets),
+                                      Rolling_average(window, buckets),
+                                      Rolling_average(window, buckets))
+
+    def update(self, now=None):
+        """Decode every frame waiting on the UART, returns how many.
+
+        Does not block, so it can also be called from a timer callback
+        scheduled with micropython.schedule().
+
+        """
+
+        if now is None:
+            now = int(time())
+        count = 0
+        for data in self.frames():
+            self.latest = (data[0], data[1], data[2])
+            for averages in self._averages.values():
+                averages[0].add(data[0], now)
+                averages[1].add(data[1], now)
+                averages[2].add(data[2], now)
+            count += 1
+        if count:
+            self.updated = now
+        return (count)
+
+    async def run(self, interval=0.5):
+        """Keep reading the sensor, interval is seconds between reads."""
+
+        while True:
+            self.update()
+            await uasyncio.sleep(interval)
+
+    def start(self, interval=0.5):
+        """Start reading the sensor in a uasyncio task, returns the task."""
+
+        return (uasyncio.create_task(self.run(interval)))
+
+    def read_latest(self):
+        """Get the newest reading without waiting.
+
+        Returns:
+        tuple -- pm1, pm2, pm10
+
+        """
+
+        if self.latest is None:
+            raise PM25_serial_not_ready("No reading received yet")
+        return (self.latest)
+
+    def read_average(self, window=60, now=None):
+        """Get the average readings over a time window.
+
+        Keyword arguments:
+        window -- seconds to average over, 60, 900 or 3600
+
+        Returns:
+        tuple -- pm1, pm2, pm10, each None if there are no readings
+
+        """
+
+        if window not in self._averages:
+            raise PM25_invalid_window("Window must be one of {0}".format(
+                sorted(self._averages)))
+        if now is None:
+            now = int(time())
+        averages = self._averages[window]
+        return (averages[0].average(now), averages[1].average(now),
+                averages[2].average(now))
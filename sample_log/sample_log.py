@@ -0,0 +1,146 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Log sensor readings to flash in fixed size blocks
+
+import os
+import struct
+from binascii import crc32
+from time import time
+
+"""Sample log, keep readings on flash while the network is down
+
+Exported class's:
+Sample_log -- Buffer readings in RAM and append them to flash in blocks
+
+"""
+
+# Each block starts with a header, then as many records as fit.
+# Header: magic, number of records, crc32 of the record bytes
+BLOCK_SIZE = 512
+BLOCK_MAGIC = b"SL"
+BLOCK_HEADER = "<2sHI"
+HEADER_SIZE = struct.calcsize(BLOCK_HEADER)
+# Record: time in seconds, channel number, value
+RECORD = "<IBf"
+RECORD_SIZE = struct.calcsize(RECORD)
+RECORDS_PER_BLOCK = (BLOCK_SIZE - HEADER_SIZE) // RECORD_SIZE
+
+# Channel numbers are the index in this tuple
+CHANNELS = ("co2", "pm1", "pm2", "pm10", "temperature", "pressure",
+            "humidity", "gas_resistance", "iaq")
+
+
+class Sample_log_unknown_channel(Exception):
+    pass
+
+
+class Sample_log:
+    def __init__(self, path="/log", segment_blocks=64, max_segments=8,
+                 channels=CHANNELS):
+        """Set up the log, carrying on from any segments already there.
+
+        Keyword arguments:
+        path -- directory the segment files are kept in
+        segment_blocks -- blocks written to a segment before starting a
+                          new one
+        max_segments -- segments kept, the oldest is removed after this
+        channels -- channel names, their index is stored in each record
+
+
+        """
+
+        self.path = path
+        self.segment_blocks = segment_blocks
+        self.max_segments = max_segments
+        self.channels = channels
+
+        # One block is filled in RAM, then written in one go
+        self._block = bytearray(BLOCK_SIZE)
+        self._count = 0
+
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass
+        segments = self.segments()
+        if segments:
+            self._segment = int(segments[-1][4:-4])
+            size = os.stat(self._segment_path(self._segment))[6]
+            self._blocks = size // BLOCK_SIZE
+            if size % BLOCK_SIZE:
+                # The last write was torn by a power cut, blocks appended
+                # after it would not start on a block boundary. Start a
+                # new segment with the next block instead.
+                self._blocks = self.segment_blocks
+        else:
+            self._segment = 0
+            self._blocks = 0
+
+    def _segment_path(self, segment):
+        return ("{0}/log_{1:08d}.bin".format(self.path, segment))
+
+    def segments(self):
+        """Get the segment file names, oldest first"""
+
+        names = []
+        for name in os.listdir(self.path):
+            if name.startswith("log_") and name.endswith(".bin"):
+                names.append(name)
+        names.sort()
+        return (names)
+
+    def add(self, name, value, now=None):
+        """Add a reading, written to flash once a block is full.
+
+        Keyword arguments:
+        name -- channel name
+        value -- the reading
+        now -- time of the reading in seconds, defaults to now
+
+
+        """
+
+        try:
+            channel = self.channels.index(name)
+        except ValueError:
+            raise Sample_log_unknown_channel("Unknown channel {0}".format(
+                name))
+        if now is None:
+            now = int(time())
+        struct.pack_into(RECORD, self._block,
+                         HEADER_SIZE + self._count * RECORD_SIZE,
+                         now, channel, value)
+        self._count += 1
+        if self._count == RECORDS_PER_BLOCK:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered readings to flash, even if the block is not
+        full. Call before deep sleep or power off."""
+
+        if self._count == 0:
+            return
+        block = self._block
+        end = HEADER_SIZE + self._count * RECORD_SIZE
+        # Unused space is zeroed so stale records never reach flash
+        for i in range(end, BLOCK_SIZE):
+            block[i] = 0
+        checksum = crc32(memoryview(block)[HEADER_SIZE:end])
+        struct.pack_into(BLOCK_HEADER, block, 0, BLOCK_MAGIC, self._count,
+                         checksum)
+
+        if self._blocks >= self.segment_blocks:
+            self._rotate()
+        with open(self._segment_path(self._segment), "ab") as segment:
+            segment.write(block)
+        self._blocks += 1
+        self._count = 0
+
+    def _rotate(self):
+        """Start a new segment and remove the oldest ones."""
+
+        self._segment += 1
+        self._blocks = 0
+        segments = self.segments()
+        while len(segments) >= self.max_segments:
+            os.remove("{0}/{1}".format(self.path, segments.pop(0)))
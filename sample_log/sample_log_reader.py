@@ -0,0 +1,100 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Read sample log segments copied off a device
+
+import mmap
+import struct
+import sys
+from binascii import crc32
+from sample_log import BLOCK_SIZE, BLOCK_MAGIC, BLOCK_HEADER, HEADER_SIZE, \
+    RECORD, RECORD_SIZE, CHANNELS
+
+"""Sample log reader, runs on a PC with CPython
+
+Exported functions:
+read_segment -- Yield the readings in a segment file
+main -- Print segment files as CSV
+
+"""
+
+_HEADER = struct.Struct(BLOCK_HEADER)
+_RECORD = struct.Struct(RECORD)
+
+
+def read_segment(file_name, bad_blocks=None):
+    """Yield the readings in a segment file, oldest first.
+
+    Keyword arguments:
+    file_name -- path of the segment file
+    bad_blocks -- list the offsets of blocks failing the checks are
+                  appended to
+
+    Yields:
+    tuple -- time, channel number, value
+
+    """
+
+    with open(file_name, "rb") as segment:
+        try:
+            data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            return
+        with data:
+            view = memoryview(data)
+            try:
+                yield from _read_blocks(data, view, bad_blocks)
+            finally:
+                view.release()
+
+
+def _read_blocks(data, view, bad_blocks):
+    """Yield the records of every good block.
+
+    After a bad block the next block is looked for at any offset, so
+    blocks written after a torn write are still found.
+
+    """
+
+    offset = 0
+    # Offset of the bad data being skipped, None if the last block was good
+    bad = None
+    while offset + BLOCK_SIZE <= len(data):
+        magic, count, checksum = _HEADER.unpack_from(data, offset)
+        start = offset + HEADER_SIZE
+        end = start + count * RECORD_SIZE
+        if magic == BLOCK_MAGIC and end <= offset + BLOCK_SIZE and \
+                crc32(view[start:end]) == checksum:
+            bad = None
+            yield from _RECORD.iter_unpack(view[start:end])
+            offset += BLOCK_SIZE
+            continue
+        if bad is None:
+            bad = offset
+            if bad_blocks is not None:
+                bad_blocks.append(offset)
+        offset = data.find(BLOCK_MAGIC, offset + 1)
+        if offset < 0:
+            return
+    # A block cut short at the end of the file
+    if bad is None and offset < len(data) and bad_blocks is not None:
+        bad_blocks.append(offset)
+
+
+def main(file_names):
+    """Print the readings in the segment files as CSV"""
+
+    print("time,channel,value")
+    for file_name in file_names:
+        bad_blocks = []
+        for now, channel, value in read_segment(file_name, bad_blocks):
+            if channel < len(CHANNELS):
+                channel = CHANNELS[channel]
+            print("{0},{1},{2}".format(now, channel, value))
+        for offset in bad_blocks:
+            print("{0}: bad block at offset {1}".format(file_name, offset),
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,156 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Poll several sensors at their own rates
+
+from time import ticks_ms, ticks_add, ticks_diff, sleep_ms
+
+"""Scheduler, runs sensor reads cooperatively against deadlines
+
+Exported class's:
+Scheduler_task -- One registered read and its counters
+Scheduler -- Register reads and run them when they are due
+
+"""
+
+
+class Scheduler_task_exists(Exception):
+    pass
+
+
+class Scheduler_invalid_interval(Exception):
+    pass
+
+
+class Scheduler_task:
+    def __init__(self, name, read, interval, min_interval=0, callback=None):
+        """Set up a task.
+
+        Keyword arguments:
+        name -- name used in reports and callbacks
+        read -- function to call, such as a driver read_sensor method
+        interval -- seconds between reads, at least 1ms
+        min_interval -- seconds the device needs between reads, such as
+                        the 1s gas cycle of the BME680
+        callback -- called as callback(name, value) after each read
+
+
+        """
+
+        self.name = name
+        self.read = read
+        self.interval_ms = int(max(interval, min_interval) * 1000)
+        if self.interval_ms <= 0:
+            raise Scheduler_invalid_interval("Task {0} needs an interval of "
+                                             "at least 1ms".format(name))
+        self.callback = callback
+
+        self.next_due = ticks_ms()
+        self.value = None
+        self.error = None
+        # Reads done, done later than allowed, missed, and failed
+        self.runs = 0
+        self.late = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def stats(self):
+        """Get the task counters, returns a dict"""
+
+        return ({"runs": self.runs, "late": self.late,
+                 "skipped": self.skipped, "errors": self.errors})
+
+
+class Scheduler:
+    def __init__(self, late_tolerance=0.1):
+        """Set up the scheduler.
+
+        Keyword arguments:
+        late_tolerance -- seconds after its deadline a read is counted late
+
+        """
+
+        self.late_tolerance_ms = int(late_tolerance * 1000)
+        self.tasks = []
+
+    def add(self, name, read, interval, min_interval=0, callback=None):
+        """Register a read, see Scheduler_task, returns the task"""
+
+        for task in self.tasks:
+            if task.name == name:
+                raise Scheduler_task_exists("Task {0} already added".format(
+                    name))
+        task = Scheduler_task(name, read, interval, min_interval, callback)
+        self.tasks.append(task)
+        return (task)
+
+    def _run_task(self, task, now):
+        """Run one due task and move its deadline on."""
+
+        overdue = ticks_diff(now, task.next_due)
+        if overdue > self.late_tolerance_ms:
+            task.late += 1
+
+        try:
+            task.value = task.read()
+            task.error = None
+            if task.callback is not None:
+                task.callback(task.name, task.value)
+        except Exception as error:
+            # A sensor that is not ready, or a failing callback, should
+            # not stop the others
+            task.error = error
+            task.errors += 1
+        task.runs += 1
+
+        # Deadlines that have passed completely are skipped, not caught up
+        missed = overdue // task.interval_ms
+        task.skipped += missed
+        task.next_due = ticks_add(task.next_due,
+                                  (missed + 1) * task.interval_ms)
+
+    def run_once(self):
+        """Run every task that is due, returns ms until the next one is"""
+
+        # Most overdue first
+        while True:
+            now = ticks_ms()
+            due = None
+            for task in self.tasks:
+                if ticks_diff(now, task.next_due) >= 0 and (
+                        due is None or
+                        ticks_diff(due.next_due, task.next_due) > 0):
+                    due = task
+            if due is None:
+                break
+            self._run_task(due, now)
+
+        wait = None
+        now = ticks_ms()
+        for task in self.tasks:
+            until = ticks_diff(task.next_due, now)
+            if wait is None or until < wait:
+                wait = until
+        if wait is None or wait < 0:
+            wait = 0
+        return (wait)
+
+    def run(self):
+        """Run the tasks forever, sleeping until the next deadline"""
+
+        while True:
+            sleep_ms(self.run_once())
+
+    async def arun(self):
+        """Run the tasks forever in a uasyncio task"""
+
+        import uasyncio
+        while True:
+            await uasyncio.sleep_ms(self.run_once())
+
+    def stats(self):
+        """Get the counters of every task, returns a dict keyed by name"""
+
+        report = {}
+        for task in self.tasks:
+            report[task.name] = task.stats()
+        return (report)
@@ -0,0 +1,107 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Simulated bme680 library for running the drivers on a PC
+
+from time import sleep
+
+"""Simulated bme680 module, drop in for the BME680 library
+
+Exported class's:
+BME680 -- Sensor returning scripted or steady readings
+
+"""
+
+OS_NONE = 0
+OS_1X = 1
+OS_2X = 2
+OS_4X = 3
+OS_8X = 4
+OS_16X = 5
+FILTER_SIZE_0 = 0
+FILTER_SIZE_1 = 1
+FILTER_SIZE_3 = 2
+FILTER_SIZE_7 = 3
+FILTER_SIZE_15 = 4
+DISABLE_GAS_MEAS = 0
+ENABLE_GAS_MEAS = 1
+I2C_ADDR_PRIMARY = 0x76
+I2C_ADDR_SECONDARY = 0x77
+
+
+class FieldData:
+    def __init__(self):
+        self.temperature = 0
+        self.pressure = 0
+        self.humidity = 0
+        self.gas_resistance = 0
+        self.heat_stable = False
+
+
+class BME680:
+    # Seconds a forced mode measurement takes
+    latency = 0
+    # Reading used when nothing is scripted
+    reading = (21.5, 1013.25, 50000, 45.0)
+
+    def __init__(self, i2c_addr=I2C_ADDR_SECONDARY, i2c_device=None):
+        """Set up the sensor
+
+        Attributes tests can set:
+        readings -- iterator of (temperature, pressure, gas_resistance,
+                    humidity) used before falling back to reading
+        reading -- tuple returned when nothing is scripted
+        latency -- seconds each measurement takes
+        heat_stable -- False makes measurements report an unstable heater
+
+        """
+
+        self.i2c_addr = i2c_addr
+        self.i2c_device = i2c_device
+        self.data = FieldData()
+        self.readings = None
+        self.heat_stable = True
+        self.settings = {}
+        self.measurements = 0
+
+    def _set(self, name, value):
+        self.settings[name] = value
+
+    def set_humidity_oversample(self, value):
+        self._set("humidity_oversample", value)
+
+    def set_pressure_oversample(self, value):
+        self._set("pressure_oversample", value)
+
+    def set_temperature_oversample(self, value):
+        self._set("temperature_oversample", value)
+
+    def set_filter(self, value):
+        self._set("filter", value)
+
+    def set_gas_status(self, value):
+        self._set("gas_status", value)
+
+    def set_gas_heater_temperature(self, value, nb_profile=0):
+        self._set("gas_heater_temperature", value)
+
+    def set_gas_heater_duration(self, value, nb_profile=0):
+        self._set("gas_heater_duration", value)
+
+    def select_gas_heater_profile(self, value):
+        self._set("gas_heater_profile", value)
+
+    def get_sensor_data(self):
+        self.measurements += 1
+        if self.latency:
+            sleep(self.latency)
+        reading = self.reading
+        if self.readings is not None:
+            try:
+                reading = next(self.readings)
+            except StopIteration:
+                self.readings = None
+        data = self.data
+        data.temperature, data.pressure, data.gas_resistance, \
+            data.humidity = reading
+        data.heat_stable = self.heat_stable
+        return (True)
@@ -0,0 +1,71 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Simulated I2C adapter for running the drivers on a PC
+
+"""Simulated i2c module, drop in for the bme680 library I2C adapter
+
+Exported class's:
+I2CAdapter -- I2C bus with a block of register memory per device
+
+"""
+
+# micropython raises OSError with this errno when no device answers
+_ENODEV = 19
+
+
+class I2CAdapter:
+    def __init__(self, scl=None, sda=None, freq=400000):
+        """Set up the bus
+
+        Attributes tests can set:
+        devices -- address: bytearray of register values, add_device()
+                   adds one. The simulated BME680 does not use the bus.
+        transactions -- number of reads and writes so far
+
+
+        """
+
+        self.scl = scl
+        self.sda = sda
+        self.freq = freq
+        self.devices = {}
+        self.transactions = 0
+
+    def add_device(self, address, registers=256):
+        """Add a device answering at address, returns its registers"""
+
+        self.devices[address] = bytearray(registers)
+        return (self.devices[address])
+
+    def _device(self, address):
+        self.transactions += 1
+        try:
+            return (self.devices[address])
+        except KeyError:
+            raise OSError(_ENODEV)
+
+    def scan(self):
+        return (sorted(self.devices))
+
+    def readfrom_mem_into(self, address, register, buffer):
+        registers = self._device(address)
+        buffer[:] = registers[register:register + len(buffer)]
+
+    def readfrom_mem(self, address, register, length):
+        return (bytes(self._device(address)[register:register + length]))
+
+    def writeto_mem(self, address, register, data):
+        registers = self._device(address)
+        registers[register:register + len(data)] = data
+
+    def read_byte_data(self, address, register):
+        return (self.readfrom_mem(address, register, 1)[0])
+
+    def read_i2c_block_data(self, address, register, length):
+        return (self.readfrom_mem(address, register, length))
+
+    def write_byte_data(self, address, register, data):
+        self.writeto_mem(address, register, bytes([data]))
+
+    def write_i2c_block_data(self, address, register, data):
+        self.writeto_mem(address, register, bytes(data))
@@ -0,0 +1,331 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Simulated machine module for running the drivers on a PC
+
+from time import monotonic, sleep
+import random
+import _thread
+
+"""Simulated machine module, drop in for UART, ADC, Pin and RTC
+
+Exported class's:
+Pin -- Pin that only remembers its number
+UART -- UART fed from scripted byte streams
+ADC -- ADC returning scripted or noisy values
+RTC -- RTC memory that survives deepsleep()
+Timer -- Periodic or one shot timer calling back from a thread
+Deep_sleep -- Raised by deepsleep(), ends the simulated wake
+
+Exported functions:
+reset_cause -- Why the simulated ESP32 last started
+deepsleep -- Keep RTC memory and end the wake by raising Deep_sleep
+power_on -- Start again from a cold boot, RTC memory is lost
+
+"""
+
+# Poll flags used by ioctl(), same values as micropython
+_MP_STREAM_POLL = 3
+_POLLIN = 0x0001
+_POLLOUT = 0x0004
+
+# reset_cause() values, same as the esp32 port
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+# Size of the esp32 RTC user memory
+_RTC_MEMORY_SIZE = 2048
+
+# Survive deepsleep(), like the RTC slow memory
+_reset_cause = PWRON_RESET
+_rtc_memory = b""
+# Every deepsleep() time in ms, for checking duty cycles
+slept = []
+
+
+class Deep_sleep(SystemExit):
+    pass
+
+
+def reset_cause():
+    return (_reset_cause)
+
+
+def deepsleep(time_ms=0):
+    """Record the sleep and raise Deep_sleep, the next wake is warm"""
+
+    global _reset_cause
+    _reset_cause = DEEPSLEEP_RESET
+    slept.append(time_ms)
+    raise Deep_sleep(time_ms)
+
+
+def power_on():
+    """Forget RTC memory, the next wake is a cold boot"""
+
+    global _reset_cause, _rtc_memory
+    _reset_cause = PWRON_RESET
+    _rtc_memory = b""
+    del slept[:]
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return (self._value)
+        self._value = value
+
+
+class UART_taken(OSError):
+    pass
+
+
+class UART:
+    # Seconds before bytes fed or replied become readable
+    latency = 0
+    # Keep everything written in written, turn off when benchmarking
+    record = True
+    # UART id: the object that last set its pins, there is one of each
+    # hardware UART however many objects are made
+    _ports = {}
+
+    def __init__(self, id, baudrate=9600, **kwargs):
+        """Set up the UART, see init() for the keyword arguments
+
+        Attributes tests can set:
+        latency -- seconds before fed or replied bytes become readable
+        responder -- called with each write, returns bytes to reply or None
+        record -- keep everything written in written
+
+        Like the hardware, setting up the same id on other pins takes the
+        UART away from the object that had it, which then raises
+        UART_taken when used.
+
+        """
+
+        self.id = id
+        self.baudrate = baudrate
+        self.timeout = 0
+        self.responder = None
+        # Everything written by the driver
+        self.written = bytearray()
+        # (time readable, bytes) waiting to be read, oldest first
+        self._pending = []
+        self._rx = bytearray()
+        self.pins = None
+        self.init(baudrate, **kwargs)
+
+    def init(self, baudrate=9600, bits=8, parity=None, stop=1, rx=None,
+             tx=None, timeout=None, **kwargs):
+        self.baudrate = baudrate
+        if timeout is not None:
+            self.timeout = timeout
+        if rx is not None or tx is not None:
+            self.pins = (rx, tx)
+        self._ports[self.id] = self
+
+    def _check(self):
+        """Raise if another object has set this UART up on other pins."""
+
+        owner = self._ports[self.id]
+        if owner is not self and owner.pins != self.pins:
+            raise UART_taken("UART {0} set up again on pins {1}".format(
+                self.id, owner.pins))
+
+    def feed(self, data, delay=None):
+        """Make bytes readable after delay seconds, latency by default"""
+
+        if delay is None:
+            delay = self.latency
+        self._pending.append((monotonic() + delay, bytes(data)))
+
+    def _receive(self):
+        """Move bytes whose time has come into the receive buffer."""
+
+        now = monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            self._rx.extend(self._pending.pop(0)[1])
+
+    def any(self):
+        self._check()
+        self._receive()
+        return (len(self._rx))
+
+    def write(self, data, length=None):
+        self._check()
+        if length is not None and length < len(data):
+            data = memoryview(data)[:length]
+        if self.record:
+            self.written.extend(data)
+        if self.responder is not None:
+            reply = self.responder(bytes(data))
+            if reply:
+                self.feed(reply)
+        return (len(data))
+
+    def _wait(self):
+        """Wait up to the UART timeout (ms) for bytes to arrive."""
+
+        self._check()
+        self._receive()
+        if not self._rx and self._pending and self.timeout:
+            wait = min(self._pending[0][0] - monotonic(),
+                       self.timeout / 1000)
+            if wait > 0:
+                sleep(wait)
+            self._receive()
+
+    def read(self, count=None):
+        self._wait()
+        if not self._rx:
+            return (None)
+        if count is None:
+            count = len(self._rx)
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        return (data)
+
+    def readinto(self, buffer, count=None):
+        self._wait()
+        if count is None:
+            count = len(buffer)
+        count = min(count, len(self._rx))
+        if not count:
+            return (None)
+        buffer[:count] = self._rx[:count]
+        del self._rx[:count]
+        return (count)
+
+    def readline(self):
+        self._wait()
+        end = self._rx.find(b"\n")
+        if end < 0:
+            return (self.read())
+        return (self.read(end + 1))
+
+    def ioctl(self, request, flags):
+        """Stream poll support, so uasyncio.StreamReader works."""
+
+        if request != _MP_STREAM_POLL:
+            return (0)
+        ready = flags & _POLLOUT
+        if flags & _POLLIN and self.any():
+            ready |= _POLLIN
+        return (ready)
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    # Reading returned when nothing is scripted, and its noise
+    level = 1000
+    noise = 0
+
+    def __init__(self, pin):
+        """Set up the ADC
+
+        Attributes tests can set:
+        values -- iterator of readings returned before falling back to
+                  level plus gaussian noise
+        level -- reading returned when no values are scripted
+        noise -- standard deviation of the noise added to level
+
+        """
+
+        self.pin = pin
+        self.values = None
+        self.reads = 0
+
+    def atten(self, attenuation):
+        self.attenuation = attenuation
+
+    def width(self, width):
+        self.bits = width
+
+    def read(self):
+        self.reads += 1
+        if self.values is not None:
+            try:
+                return (next(self.values))
+            except StopIteration:
+                self.values = None
+        value = self.level
+        if self.noise:
+            value = int(random.gauss(value, self.noise))
+        return (max(0, min(4095, value)))
+
+
+class RTC:
+    def memory(self, data=None):
+        """Get or set the bytes kept across deepsleep()"""
+
+        global _rtc_memory
+        if data is None:
+            return (_rtc_memory)
+        if len(data) > _RTC_MEMORY_SIZE:
+            raise ValueError("buffer too long")
+        _rtc_memory = bytes(data)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id, **kwargs):
+        """Set up the timer, see init() for the keyword arguments
+
+        Tests that step time by hand can call fire() instead of init()
+
+
+        """
+
+        self.id = id
+        self.callback = None
+        self._generation = 0
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=None, callback=None):
+        """Start calling callback(timer) every period ms from a thread"""
+
+        self.deinit()
+        if freq is not None:
+            period = 1000 / freq
+        self.mode = mode
+        self.period = period
+        self.callback = callback
+        if callback is not None and period > 0:
+            _thread.start_new_thread(self._run, (self._generation,))
+
+    def _run(self, generation):
+        while generation == self._generation:
+            sleep(self.period / 1000)
+            if generation != self._generation:
+                break
+            self.fire()
+            if self.mode == self.ONE_SHOT:
+                break
+
+    def fire(self):
+        if self.callback is not None:
+            self.callback(self)
+
+    def deinit(self):
+        # Running threads see the new generation and stop
+        self._generation += 1
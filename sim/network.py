@@ -0,0 +1,83 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Simulated network module for running the drivers on a PC
+
+from time import monotonic
+
+"""Simulated network module, drop in for WLAN
+
+Exported class's:
+WLAN -- Station interface that connects after a set delay
+
+"""
+
+STA_IF = 0
+AP_IF = 1
+
+
+class WLAN:
+    # Seconds from connect() until isconnected() is True, None never
+    connect_time = 1
+    # Extra seconds a connect without a bssid and channel spends scanning
+    scan_time = 0
+    # Access points returned by scan(), same tuple layout as micropython
+    access_points = [(b"sim", b"\x02\x00\x00\x00\x00\x01", 6, -50, 3, 0)]
+
+    def __init__(self, interface=STA_IF):
+        """Set up the interface
+
+        Attributes tests can set:
+        connect_time -- seconds from connect() until connected, None
+                        to never connect
+        scan_time -- added to connect_time when no bssid and channel
+                     are given
+        access_points -- tuples returned by scan()
+
+        """
+
+        self.interface = interface
+        self._active = False
+        self._connected_at = None
+        self.connects = 0
+        self.connect_args = None
+        self.settings = {}
+
+    def active(self, active=None):
+        if active is None:
+            return (self._active)
+        self._active = active
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        self.connects += 1
+        self.connect_args = (ssid, key, bssid)
+        if self.connect_time is None:
+            self._connected_at = None
+        else:
+            delay = self.connect_time
+            if bssid is None or "channel" not in self.settings:
+                delay += self.scan_time
+            self._connected_at = monotonic() + delay
+
+    def disconnect(self):
+        self._connected_at = None
+
+    def isconnected(self):
+        return (self._connected_at is not None and
+                monotonic() >= self._connected_at)
+
+    def status(self, param=None):
+        if param == "rssi":
+            return (self.access_points[0][3])
+        return (None)
+
+    def ifconfig(self):
+        return (("192.168.4.2", "255.255.255.0", "192.168.4.1",
+                 "192.168.4.1"))
+
+    def config(self, *args, **kwargs):
+        if args:
+            return (self.settings.get(args[0]))
+        self.settings.update(kwargs)
+
+    def scan(self):
+        return (list(self.access_points))
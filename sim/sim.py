@@ -0,0 +1,191 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Run the drivers on a PC against simulated hardware
+
+import struct
+import sys
+import time
+
+"""Simulation helpers, set up CPython and script the simulated devices
+
+Exported functions:
+install -- Add the micropython time functions and the driver directories
+pm25_frame -- Build a PM2.5 sensor frame
+feed_pm25 -- Feed PM2.5 frames to a UART, one a second by default
+eink_responder -- Reply to e-ink commands like the display controller
+run_cycles -- Run a main function over several deep sleep wakes
+
+"""
+
+# micropython ticks wrap at 2**30
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+# Directories holding the drivers, relative to the repository
+DRIVER_DIRS = ("bme680", "co2", "pm25", "waveshare-e-ink-4in3",
+               "wifi_setup", "scheduler", "timeseries", "sample_log",
+               "telemetry", "duty_cycle", "i2c_bus", "driver_stats")
+
+
+def _ticks_ms():
+    return (int(time.monotonic() * 1000) & _TICKS_MAX)
+
+
+def _ticks_us():
+    return (int(time.monotonic() * 1000000) & _TICKS_MAX)
+
+
+def _ticks_add(ticks, delta):
+    return ((ticks + delta) & _TICKS_MAX)
+
+
+def _ticks_diff(ticks1, ticks2):
+    return (((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF)
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def _sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+def install(driver_paths=True):
+    """Make CPython look enough like micropython to import the drivers.
+
+    Adds ticks_ms(), ticks_us(), ticks_add(), ticks_diff(), sleep_ms()
+    and sleep_us() to the time module. Call before importing any driver.
+
+    Keyword arguments:
+    driver_paths -- also put the simulation and driver directories and
+                    the repository on sys.path, so "import eink" and
+                    "import esp32_modules" work
+
+
+    """
+
+    if not hasattr(time, "ticks_ms"):
+        time.ticks_ms = _ticks_ms
+        time.ticks_us = _ticks_us
+        time.ticks_add = _ticks_add
+        time.ticks_diff = _ticks_diff
+        time.sleep_ms = _sleep_ms
+        time.sleep_us = _sleep_us
+
+    if driver_paths:
+        # The repository is the directory above this one
+        here = __file__.rpartition("/")[0] or "."
+        root = here + "/.."
+        paths = (root, here) + tuple(root + "/" + name
+                                     for name in DRIVER_DIRS)
+        for path in paths:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+
+def pm25_frame(pm1, pm2, pm10, extra=(0,) * 10, checksum=None):
+    """Build a 32 byte PM2.5 sensor frame.
+
+    Keyword arguments:
+    pm1, pm2, pm10 -- readings in ug/m3
+    extra -- the other 10 data words
+    checksum -- override the checksum, to simulate a corrupt frame
+
+
+    """
+
+    frame = bytearray(b"\x42\x4d") + struct.pack(">H", 28) + \
+        struct.pack(">13H", pm1, pm2, pm10, *extra)
+    if checksum is None:
+        checksum = sum(frame) & 0xFFFF
+    frame += struct.pack(">H", checksum)
+    return (bytes(frame))
+
+
+def feed_pm25(uart, readings, interval=1, start=0):
+    """Feed PM2.5 frames to a simulated UART.
+
+    Keyword arguments:
+    uart -- simulated UART, such as PM25_sensor().uart
+    readings -- (pm1, pm2, pm10) tuples, one frame each
+    interval -- seconds between frames, the sensor sends one a second
+    start -- seconds until the first frame
+
+
+    """
+
+    for i, reading in enumerate(readings):
+        uart.feed(pm25_frame(*reading), delay=start + i * interval)
+
+
+def eink_responder(font_index=b"1"):
+    """Return a UART responder that acts like the e-ink controller.
+
+    Every complete command frame gets an "OK" reply. Font size
+    commands are remembered and returned by the font size query.
+
+    Keyword arguments:
+    font_index -- font index to report before one is set
+
+
+    """
+
+    state = {"font": font_index, "partial": b""}
+
+    def respond(data):
+        data = state["partial"] + data
+        reply = b""
+        start = 0
+        while True:
+            start = data.find(b"\xa5", start)
+            if start < 0 or len(data) - start < 4:
+                break
+            length = data[start + 1] << 8 | data[start + 2]
+            if len(data) - start < length:
+                break
+            command = data[start + 3]
+            if command == 0x1D:
+                reply += state["font"]
+            else:
+                if command == 0x1E:
+                    state["font"] = str(data[start + 4]).encode()
+                reply += b"OK"
+            start += length
+        state["partial"] = data[start:] if start >= 0 else b""
+        return (reply)
+
+    return (respond)
+
+
+def run_cycles(wake, cycles, cold=True):
+    """Run a function once per wake, like main.py under deep sleep.
+
+    Each call should end in machine.deepsleep(), the next call is then a
+    warm wake with the RTC memory kept.
+
+    Keyword arguments:
+    wake -- function run on each wake, create every driver inside it
+    cycles -- number of wakes
+    cold -- start from a cold boot, RTC memory empty
+
+    Returns:
+    list -- seconds spent awake in each wake
+
+
+    """
+
+    import machine
+
+    if cold:
+        machine.power_on()
+    awake = []
+    for _ in range(cycles):
+        start = time.monotonic()
+        try:
+            wake()
+        except machine.Deep_sleep:
+            pass
+        awake.append(time.monotonic() - start)
+    return (awake)
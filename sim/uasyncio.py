@@ -0,0 +1,48 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : uasyncio names on top of CPython asyncio
+
+import asyncio
+from asyncio import *  # noqa: F401,F403
+
+"""Simulated uasyncio module, the micropython extras on CPython asyncio
+
+Exported class's:
+StreamReader -- Reads a simulated UART without blocking the loop
+
+"""
+
+# How often a StreamReader checks the UART for new bytes
+_POLL = 0.001
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(awaitable, timeout):
+    return (await asyncio.wait_for(awaitable, timeout / 1000))
+
+
+class StreamReader:
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def read(self, count=-1):
+        while not self.stream.any():
+            await asyncio.sleep(_POLL)
+        if count < 0:
+            count = None
+        return (self.stream.read(count))
+
+    async def readexactly(self, count):
+        data = b""
+        while len(data) < count:
+            data += await self.read(count - len(data))
+        return (data)
+
+    async def readline(self):
+        data = b""
+        while not data.endswith(b"\n"):
+            data += await self.read(1)
+        return (data)
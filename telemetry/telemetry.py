@@ -0,0 +1,380 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Send batches of sensor readings over MQTT or HTTP
+
+import json
+import socket
+import struct
+from time import time, ticks_ms, ticks_add, ticks_diff
+from sample_log import RECORD, RECORD_SIZE, CHANNELS
+
+"""Telemetry, batch readings and publish them over one connection
+
+Exported class's:
+MQTT_connection -- Minimal MQTT 3.1.1 publisher, QoS 0 or 1
+HTTP_connection -- POST payloads to a URL
+Telemetry -- Batch readings, publish over MQTT with HTTP as fallback
+
+"""
+
+# Payload: version, number of records, then the records in the same
+# format as the sample log
+PAYLOAD_VERSION = 1
+PAYLOAD_HEADER = "<BH"
+PAYLOAD_HEADER_SIZE = struct.calcsize(PAYLOAD_HEADER)
+
+
+class Telemetry_publish_failed(Exception):
+    pass
+
+
+class Telemetry_unknown_channel(Exception):
+    pass
+
+
+def _open_socket(host, port, timeout):
+    """Connect a TCP socket, returns the socket"""
+
+    address = socket.getaddrinfo(host, port)[0][-1]
+    sock = socket.socket()
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return (sock)
+
+
+def _read_exactly(sock, count):
+    """Read count bytes, raises OSError if the connection closes"""
+
+    data = b""
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise OSError("Connection closed")
+        data += chunk
+    return (data)
+
+
+class MQTT_connection:
+    def __init__(self, host, port=1883, client_id="esp32", timeout=5):
+        """Set up the connection, nothing is sent until connect()
+
+        Keyword arguments:
+        host -- broker host name or address
+        port -- broker port
+        client_id -- MQTT client id, must be unique on the broker
+        timeout -- socket timeout in seconds
+
+        """
+
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.timeout = timeout
+        self.sock = None
+        # Packet identifier of the last QoS 1 publish
+        self._packet_id = 0
+
+    def _remaining_length(self, length):
+        """Encode an MQTT remaining length, see spec section 2.2.3"""
+
+        encoded = bytearray()
+        while True:
+            byte = length % 128
+            length //= 128
+            if length:
+                byte |= 0x80
+            encoded.append(byte)
+            if not length:
+                return (encoded)
+
+    def connect(self):
+        """Open the connection, raises OSError on failure"""
+
+        client_id = self.client_id.encode()
+        # Protocol name, level 4, clean session, keep alive off
+        variable = b"\x00\x04MQTT\x04\x02\x00\x00"
+        payload = struct.pack(">H", len(client_id)) + client_id
+        packet = b"\x10" + self._remaining_length(
+            len(variable) + len(payload)) + variable + payload
+
+        self.sock = _open_socket(self.host, self.port, self.timeout)
+        try:
+            self.sock.sendall(packet)
+            connack = _read_exactly(self.sock, 4)
+            if connack[0] != 0x20 or connack[3] != 0:
+                raise OSError("Broker refused connection: {0}".format(
+                    connack[3]))
+        except OSError:
+            self.close()
+            raise
+
+    def publish(self, topic, payload, qos=1):
+        """Publish a message, raises OSError on failure
+
+        With QoS 1 this returns once the broker has acknowledged the
+        message. A connection that died without being closed, such as
+        after a WiFi drop, then times out instead of losing the message.
+
+        Keyword arguments:
+        topic -- topic to publish to
+        payload -- bytes to publish
+        qos -- 0 to send and forget, 1 to wait for the PUBACK
+
+
+        """
+
+        topic = topic.encode()
+        variable = struct.pack(">H", len(topic)) + topic
+        if qos:
+            self._packet_id = self._packet_id % 0xFFFF + 1
+            variable += struct.pack(">H", self._packet_id)
+        header = bytes([0x30 | qos << 1]) + self._remaining_length(
+            len(variable) + len(payload)) + variable
+        self.sock.sendall(header)
+        self.sock.sendall(payload)
+        if qos:
+            self._wait_puback(self._packet_id)
+
+    def _wait_puback(self, packet_id):
+        """Read packets until the PUBACK for packet_id arrives."""
+
+        while True:
+            packet_type = _read_exactly(self.sock, 1)[0]
+            length = 0
+            shift = 0
+            while True:
+                byte = _read_exactly(self.sock, 1)[0]
+                length |= (byte & 0x7F) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            body = _read_exactly(self.sock, length) if length else b""
+            if packet_type == 0x40 and length == 2 and \
+                    struct.unpack(">H", body)[0] == packet_id:
+                return
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class HTTP_connection:
+    def __init__(self, url, timeout=5):
+        """Set up the connection
+
+        Keyword arguments:
+        url -- URL to POST payloads to, http:// only
+        timeout -- socket timeout in seconds
+
+        """
+
+        if not url.startswith("http://"):
+            raise Telemetry_publish_failed("Only http:// URLs are supported")
+        host, _, path = url[7:].partition("/")
+        self.path = "/" + path
+        self.host = host
+        host, _, port = host.partition(":")
+        self.address = (host, int(port) if port else 80)
+        self.timeout = timeout
+
+    def publish(self, payload, path=None,
+                content_type="application/octet-stream"):
+        """POST a payload, raises OSError on failure
+
+        Keyword arguments:
+        payload -- bytes to send
+        path -- path to POST to, the path of the URL if None
+        content_type -- Content-Type header of the payload
+
+
+        """
+
+        if path is None:
+            path = self.path
+        sock = _open_socket(self.address[0], self.address[1], self.timeout)
+        try:
+            sock.sendall("POST {0} HTTP/1.0\r\nHost: {1}\r\n"
+                         "Content-Type: {2}\r\n"
+                         "Content-Length: {3}\r\n\r\n".format(
+                             path, self.host, content_type,
+                             len(payload)).encode())
+            sock.sendall(payload)
+            status = sock.recv(12).split()
+            if len(status) < 2 or not status[1].startswith(b"2"):
+                raise OSError("HTTP status {0}".format(status))
+        finally:
+            sock.close()
+
+
+class Telemetry:
+    def __init__(self, mqtt=None, topic="sensors", http=None, batch_size=50,
+                 channels=CHANNELS, backoff=1, max_backoff=300):
+        """Set up the publisher
+
+        Keyword arguments:
+        mqtt -- MQTT_connection to publish to, or None
+        topic -- MQTT topic to publish to
+        http -- HTTP_connection used when MQTT fails, or None
+        batch_size -- readings sent in each message
+        channels -- channel names, their index is sent with each reading
+        backoff -- seconds to wait after the first failure, doubles after
+                   each failure up to max_backoff
+
+
+        """
+
+        self.mqtt = mqtt
+        self.topic = topic
+        self.http = http
+        self.channels = channels
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # Readings are packed straight into the payload
+        self._payload = bytearray(PAYLOAD_HEADER_SIZE +
+                                  batch_size * RECORD_SIZE)
+        self._batch_size = batch_size
+        self._count = 0
+
+        self._connected = False
+        self._wait = 0
+        self._retry_at = ticks_ms()
+
+    def add(self, name, value, now=None):
+        """Add a reading, the batch is published when full.
+
+        Raises Telemetry_publish_failed if the batch is full and can't
+        be published, the reading is not kept. Log it somewhere else,
+        such as the sample log.
+
+        """
+
+        try:
+            channel = self.channels.index(name)
+        except ValueError:
+            raise Telemetry_unknown_channel("Unknown channel {0}".format(
+                name))
+        if self._count == self._batch_size:
+            self.flush()
+        if now is None:
+            now = int(time())
+        struct.pack_into(RECORD, self._payload,
+                         PAYLOAD_HEADER_SIZE + self._count * RECORD_SIZE,
+                         now, channel, value)
+        self._count += 1
+        if self._count == self._batch_size:
+            try:
+                self.flush()
+            except Telemetry_publish_failed:
+                # kept for the next try
+                pass
+
+    def _publish_mqtt(self, payload):
+        """Publish over the open MQTT connection, reconnecting once"""
+
+        for attempt in range(2):
+            try:
+                if not self._connected:
+                    self.mqtt.connect()
+                    self._connected = True
+                self.mqtt.publish(self.topic, payload)
+                return
+            except OSError:
+                self.mqtt.close()
+                self._connected = False
+                if attempt:
+                    raise
+
+    def flush(self):
+        """Publish the buffered readings
+
+        Over MQTT the readings are cleared once the broker has
+        acknowledged them. Raises Telemetry_publish_failed if every
+        connection fails, or while backing off after a failure. The
+        readings are kept.
+
+        """
+
+        if self._count == 0:
+            return
+        if ticks_diff(self._retry_at, ticks_ms()) > 0:
+            raise Telemetry_publish_failed("Backing off after a failure")
+
+        struct.pack_into(PAYLOAD_HEADER, self._payload, 0, PAYLOAD_VERSION,
+                         self._count)
+        payload = memoryview(self._payload)[
+            :PAYLOAD_HEADER_SIZE + self._count * RECORD_SIZE]
+
+        sent = False
+        if self.mqtt is not None:
+            try:
+                self._publish_mqtt(payload)
+                sent = True
+            except OSError:
+                pass
+        if not sent and self.http is not None:
+            try:
+                self.http.publish(payload)
+                sent = True
+            except OSError:
+                pass
+
+        if not sent:
+            if self._wait == 0:
+                self._wait = self.backoff
+            else:
+                self._wait = min(self._wait * 2, self.max_backoff)
+            self._retry_at = ticks_add(ticks_ms(), int(self._wait * 1000))
+            raise Telemetry_publish_failed("Could not publish, retrying in "
+                                           "{0}s".format(self._wait))
+        self._wait = 0
+        self._count = 0
+
+    def publish_stats(self, name, stats):
+        """Publish a driver's stats() as JSON to topic/stats/name
+
+        Sent straight away over MQTT, or if MQTT fails as JSON over HTTP
+        to the URL path plus /stats/name. Raises
+        Telemetry_publish_failed if both fail.
+
+        Keyword arguments:
+        name -- name of the driver, such as "pm25"
+        stats -- dict returned by the driver's stats()
+
+
+        """
+
+        payload = json.dumps(stats).encode()
+        if self.mqtt is not None:
+            try:
+                if not self._connected:
+                    self.mqtt.connect()
+                    self._connected = True
+                self.mqtt.publish(self.topic + "/stats/" + name, payload)
+                return
+            except OSError:
+                self.mqtt.close()
+                self._connected = False
+        if self.http is not None:
+            try:
+                self.http.publish(payload, self.http.path.rstrip("/") +
+                                  "/stats/" + name, "application/json")
+                return
+            except OSError:
+                pass
+        raise Telemetry_publish_failed("Could not publish stats")
+
+    def close(self):
+        """Close the MQTT connection"""
+
+        if self.mqtt is not None:
+            self.mqtt.close()
+        self._connected = False
@@ -0,0 +1,12 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Run the tests against the simulated hardware
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+
+import sim  # noqa: E402
+
+sim.install()
@@ -0,0 +1,88 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : BME680 snapshot reads
+
+import time
+import pytest
+import bme680_wrapper
+
+
+def _sensor(readings=None, cache_ttl=0):
+    sensor = bme680_wrapper.BME680_sensor(22, 21, cache_ttl=cache_ttl)
+    sensor.enable_stats()
+    if readings is not None:
+        sensor.sensor.readings = iter(readings)
+    return (sensor)
+
+
+def test_read_all_is_one_measurement():
+    sensor = _sensor([(20.0, 1000.0, 40000, 50.0)])
+    reading = sensor.read_all()
+    assert reading == (20.0, 1000.0, 40000, 50.0)
+    assert reading.temperature == 20.0
+    assert reading.humidity == 50.0
+    assert sensor.stats()["measurements"] == 1
+
+
+def test_single_reads_measure_each_time_without_cache():
+    sensor = _sensor([(20.0, 1000.0, 40000, 50.0),
+                      (21.0, 1001.0, 41000, 51.0)])
+    assert sensor.read_temperature() == 20.0
+    assert sensor.read_pressure() == 1001.0
+    assert sensor.stats()["measurements"] == 2
+
+
+def test_cache_reused_until_ttl():
+    sensor = _sensor([(20.0, 1000.0, 40000, 50.0),
+                      (21.0, 1001.0, 41000, 51.0)], cache_ttl=0.05)
+    assert sensor.read_temperature() == 20.0
+    assert sensor.read_humidity() == 50.0
+    assert sensor.stats()["cache_hits"] == 1
+    time.sleep(0.06)
+    assert sensor.read_temperature() == 21.0
+
+
+def test_unstable_heater_raises():
+    sensor = _sensor()
+    sensor.sensor.heat_stable = False
+    with pytest.raises(bme680_wrapper.SensorUnstable):
+        sensor.read_all()
+    assert sensor.stats()["sensor_unstable"] == 1
+
+
+def test_iaq_scores_against_rolling_baseline():
+    iaq = bme680_wrapper.IAQ_estimator(window=4)
+    assert iaq.baseline() is None
+    # At the humidity baseline and gas baseline the score is perfect
+    assert iaq.add(50000, 40) == pytest.approx(100)
+    # Gas below the baseline lowers the score
+    assert iaq.add(25000, 40) < 100
+    for i in range(4):
+        iaq.add(10000, 40)
+    assert iaq.baseline() == pytest.approx(10000)
+
+
+def test_iaq_humidity_weighting():
+    iaq = bme680_wrapper.IAQ_estimator()
+    assert iaq.add(50000, 70) == pytest.approx(75 + 12.5)
+    assert iaq.add(50000, 20) == pytest.approx(75 + 12.5)
+
+
+def test_read_iaq_does_not_wait_and_reuses_a_reading():
+    sensor = _sensor([(20.0, 1000.0, 40000, 40.0)])
+    start = time.monotonic()
+    assert sensor.read_iaq() == pytest.approx(100)
+    assert time.monotonic() - start < 0.5
+    reading = sensor.read_all()
+    measurements = sensor.stats()["measurements"]
+    sensor.read_iaq(reading)
+    assert sensor.stats()["measurements"] == measurements
+
+
+def test_iaq_baseline_kept_across_deep_sleep():
+    iaq = bme680_wrapper.IAQ_estimator(window=10)
+    for gas in (10000, 20000, 30000):
+        iaq.add(gas, 40)
+    woken = bme680_wrapper.IAQ_estimator(window=10)
+    woken.load_state(iaq.save_state())
+    assert woken.baseline() == pytest.approx(20000)
@@ -0,0 +1,122 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : CO2 ADC reads and burst filtering
+
+import pytest
+import CO2
+
+
+def _ppm(code):
+    return ((code * 3300 / 4095.0 - 400) * 50.0 / 16.0)
+
+
+def _sensor(values=None, samples=16):
+    sensor = CO2.CO2_sensor(36, samples=samples)
+    sensor.enable_stats()
+    if values is not None:
+        sensor.adc.values = iter(values)
+    return (sensor)
+
+
+def test_adc_set_up_once():
+    sensor = _sensor()
+    adc = sensor.adc
+    sensor.read_sensor()
+    sensor.read_burst()
+    assert sensor.adc is adc
+    assert adc.attenuation == adc.ATTN_11DB
+    assert adc.bits == adc.WIDTH_12BIT
+
+
+def test_read_sensor():
+    sensor = _sensor([1000])
+    assert sensor.read_sensor() == pytest.approx(_ppm(1000))
+    assert sensor.stats()["adc_reads"] == 1
+
+
+def test_not_ready_below_zero_ppm():
+    sensor = _sensor([400])
+    with pytest.raises(CO2.CO2_sensor_not_ready):
+        sensor.read_sensor()
+    assert sensor.stats()["sensor_not_ready"] == 1
+
+
+def test_burst_median_ignores_spikes():
+    values = [1000] * 13 + [4095, 4095, 0]
+    sensor = _sensor(values)
+    ppm, variance = sensor.read_burst()
+    assert ppm == pytest.approx(_ppm(1000))
+    assert variance > 0
+    assert sensor.stats()["adc_reads"] == 16
+
+
+def test_burst_trimmed_mean():
+    values = [0, 0, 0, 0, 990, 1000, 1000, 1010,
+              1000, 1000, 990, 1010, 4095, 4095, 4095, 4095]
+    ppm, variance = _sensor(values).read_burst(median=False)
+    assert ppm == pytest.approx(_ppm(1000))
+
+
+def test_steady_burst_has_no_variance():
+    ppm, variance = _sensor([1200] * 8, samples=8).read_burst()
+    assert ppm == pytest.approx(_ppm(1200))
+    assert variance == pytest.approx(0)
+
+
+def _sampling(values, size=8):
+    # One sample every 100s, the tests fire the timer by hand
+    sensor = _sensor(values)
+    sensor.start(rate=0.01, size=size)
+    for i in range(len(values)):
+        sensor._timer.fire()
+    sensor.stop()
+    return (sensor)
+
+
+def test_fractional_rate_gives_whole_ms_period():
+    sensor = _sensor()
+    sensor.start(rate=3)
+    assert sensor._timer.period == 333
+    sensor.start(rate=0.5)
+    assert sensor._timer.period == 2000
+    assert isinstance(sensor._timer.period, int)
+    sensor.stop()
+
+
+def test_ring_keeps_the_newest_samples():
+    sensor = _sampling([1000, 1100, 1200, 1300, 1400], size=4)
+    assert sensor.read_latest() == round(_ppm(1400))
+    assert sensor.read_average() == pytest.approx(
+        sum(round(_ppm(code)) for code in (1100, 1200, 1300, 1400)) / 4)
+    assert sensor.read_average(2) == pytest.approx(
+        (round(_ppm(1300)) + round(_ppm(1400))) / 2)
+    assert sensor.stats()["adc_reads"] == 5
+
+
+def test_read_before_start_not_ready():
+    with pytest.raises(CO2.CO2_sensor_not_ready):
+        _sensor().read_latest()
+
+
+def test_average_leaves_out_not_ready_samples():
+    sensor = _sampling([400, 1000, 400])
+    with pytest.raises(CO2.CO2_sensor_not_ready):
+        sensor.read_latest()
+    assert sensor.read_average() == round(_ppm(1000))
+
+
+def test_trend_in_ppm_per_minute():
+    sensor = _sampling([1000, 1010, 1020, 1030])
+    step = round(_ppm(1010)) - round(_ppm(1000))
+    # 0.01 samples a second is 0.6 samples a minute
+    assert sensor.read_trend() == pytest.approx(step * 0.6, rel=0.05)
+    with pytest.raises(CO2.CO2_sensor_not_ready):
+        _sampling([1000]).read_trend()
+
+
+def test_calibration_applied_to_samples():
+    sensor = _sampling([1000])
+    sensor.calibrate([(round(_ppm(1000)), 800)])
+    assert sensor.read_latest() == 800
+    with pytest.raises(CO2.CO2_invalid_calibration):
+        sensor.calibrate([(500, 400), (500, 450)])
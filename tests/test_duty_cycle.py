@@ -0,0 +1,109 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : State kept in RTC memory across simulated deep sleep
+
+import machine
+import sim
+import duty_cycle
+
+
+class _Driver:
+    def __init__(self, size=10):
+        self.size = size
+        self.loaded = None
+
+    def save_state(self):
+        return ("x" * self.size)
+
+    def load_state(self, state):
+        self.loaded = state
+
+
+def test_state_and_samples_kept():
+    seen = []
+
+    def wake():
+        cycle = duty_cycle.Duty_cycle(60)
+        driver = cycle.attach("driver", _Driver())
+        seen.append((cycle.warm, driver.loaded, len(cycle.samples())))
+        cycle.add("co2", 600, now=1)
+        cycle.sleep()
+
+    sim.run_cycles(wake, 3)
+    assert seen == [(False, None, 0), (True, "x" * 10, 1),
+                    (True, "x" * 10, 2)]
+    assert machine.slept[0] <= 60000
+
+
+def test_oldest_samples_dropped_to_fit():
+    seen = []
+
+    def wake():
+        cycle = duty_cycle.Duty_cycle(60, max_samples=500)
+        cycle.attach("driver", _Driver(1500))
+        seen.append(cycle.stats())
+        for i in range(100):
+            cycle.add("co2", i, now=i)
+        cycle.sleep()
+
+    sim.run_cycles(wake, 2)
+    assert seen[1]["samples"] > 0
+    assert seen[1]["samples"] + seen[1]["samples_dropped"] == 100
+    assert len(machine.slept) == 2
+
+
+def test_sleeps_when_state_can_not_fit():
+    seen = []
+
+    def wake():
+        cycle = duty_cycle.Duty_cycle(60)
+        cycle.attach("driver", _Driver(3000))
+        seen.append(cycle.warm)
+        cycle.sleep()
+
+    sim.run_cycles(wake, 2)
+    assert seen == [False, False]
+    assert len(machine.slept) == 2
+
+
+def test_failed_save_wakes_cold():
+    seen = []
+    saves = []
+
+    class _Failing(_Driver):
+        def save_state(self):
+            saves.append(1)
+            if len(saves) == 2:
+                raise ValueError("can not save")
+            return (1)
+
+    def wake():
+        cycle = duty_cycle.Duty_cycle(60)
+        cycle.attach("driver", _Failing())
+        seen.append((cycle.warm, len(cycle.samples())))
+        cycle.add("co2", 600, now=1)
+        cycle.sleep()
+
+    sim.run_cycles(wake, 3)
+    # The third wake must not load the first wake's sample again
+    assert seen == [(False, 0), (True, 1), (False, 0)]
+    assert len(machine.slept) == 3
+
+
+def test_eink_bytes_lines_saved_as_text():
+    import json
+    import eink
+
+    seen = []
+
+    def wake():
+        cycle = duty_cycle.Duty_cycle(60)
+        display = cycle.attach("eink", eink.EINK_display(25, 26))
+        display.uart.responder = sim.eink_responder()
+        seen.append(cycle.warm)
+        display.write_line(b"CO2 612", "large", 1)
+        json.dumps(display.save_state())
+        cycle.sleep()
+
+    sim.run_cycles(wake, 2)
+    assert seen == [False, True]
@@ -0,0 +1,111 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : E-ink batching and the write_line() shadow
+
+import sim
+import eink
+from eink_layout import EINK_layout
+
+
+def _display():
+    display = eink.EINK_display(25, 26)
+    display.uart.responder = sim.eink_responder()
+    display.hand_shake()
+    display.enable_stats()
+    return (display)
+
+
+def _sent(display, call, *args):
+    """Bytes written to the UART by one call"""
+
+    start = len(display.uart.written)
+    call(*args)
+    return (bytes(display.uart.written[start:]))
+
+
+def test_batch_sends_one_write_and_refresh():
+    display = _display()
+    display.begin()
+    display.write_line("one", "large", 1)
+    display.write_line("two", "large", 2)
+    assert display.stats()["uart_bytes_out"] == 0
+    sent = _sent(display, display.commit)
+    assert sent.count(display._SYS_CMD_REFRESH) == 1
+    assert b"one" in sent and b"two" in sent
+    assert display.stats()["refreshes"] == 1
+
+
+def test_batch_matches_unbatched_frames():
+    batched = _display()
+    batched.begin()
+    batched.write_line("same", "small", 4)
+    sent = _sent(batched, batched.commit)
+    direct = _display()
+    direct_sent = _sent(direct, direct.write_line, "same", "small", 4)
+    assert sent == direct_sent
+
+
+def test_empty_commit_sends_nothing():
+    display = _display()
+    display.begin()
+    assert _sent(display, display.commit) == b""
+
+
+def test_unchanged_line_skipped():
+    display = _display()
+    display.write_line("CO2 612", "small", 3)
+    assert _sent(display, display.write_line, "CO2 612", "small", 3) == b""
+    assert display.stats()["lines_skipped"] == 1
+
+
+def test_line_drawn_over_in_another_size_is_resent():
+    display = _display()
+    display.write_line("CO2 612", "small", 3)
+    display.write_line("PM2.5 12", "large", 2)
+    assert b"CO2 612" in _sent(display, display.write_line, "CO2 612",
+                               "small", 3)
+
+
+def test_write_string_and_draw_forget_lines_below_them():
+    display = _display()
+    display.write_line("top", "large", 1)
+    display.write_line("low", "large", 5)
+    display.write_string("x", 300, 10)
+    display.draw_rect(0, 250, 50, 260, fill=True)
+    assert b"top" in _sent(display, display.write_line, "top", "large", 1)
+    assert b"low" in _sent(display, display.write_line, "low", "large", 5)
+
+
+def test_unrelated_draw_keeps_lines():
+    display = _display()
+    display.write_line("top", "large", 1)
+    display.draw_line(0, 500, 100, 500)
+    assert _sent(display, display.write_line, "top", "large", 1) == b""
+
+
+def test_abort_forgets_shadow():
+    display = _display()
+    display.begin()
+    display.write_line("lost", "large", 1)
+    display.abort()
+    assert b"lost" in _sent(display, display.write_line, "lost", "large", 1)
+
+
+def test_shadow_survives_deep_sleep():
+    display = _display()
+    display.write_line("kept", "medium", 2)
+    state = display.save_state()
+    woken = _display()
+    woken.load_state(state)
+    assert _sent(woken, woken.write_line, "kept", "medium", 2) == b""
+
+
+def test_layout_only_draws_changed_regions():
+    display = _display()
+    layout = EINK_layout(display, columns=2)
+    layout.add("co2", 1, 0, format="CO2 {0}")
+    layout.add("pm2", 1, 1, format="PM {0}")
+    assert layout.update({"co2": 612, "pm2": 12}) == 2
+    assert layout.update({"co2": 612, "pm2": 12}) == 0
+    sent = _sent(display, layout.update, {"co2": 700, "pm2": 12})
+    assert b"CO2 700" in sent and b"PM" not in sent
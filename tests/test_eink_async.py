@@ -0,0 +1,88 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Async e-ink replies, pipelining and timeouts
+
+import asyncio
+import pytest
+import sim
+import eink
+from eink_async import EINK_display_async, EINK_timeout
+
+
+def _display(responder=None, latency=0, **kwargs):
+    display = EINK_display_async(25, 26, **kwargs)
+    display.uart.responder = responder or sim.eink_responder(b"2")
+    display.uart.latency = latency
+    display.enable_stats()
+    return (display)
+
+
+def test_ahand_shake_reads_the_font_size():
+    display = _display()
+    assert asyncio.run(display.ahand_shake()) == b"OK"
+    assert asyncio.run(display.aget_font_size()) == "medium"
+    assert display.stats()["uart_bytes_in"] == 3
+
+
+def test_writes_pipelined_up_to_max_in_flight():
+    display = _display(latency=0.01, max_in_flight=4)
+    in_flight = []
+
+    async def main():
+        for line in range(1, 9):
+            await display.awrite_line("line", "small", line)
+            in_flight.append(display._unacked)
+        await display.drain()
+
+    asyncio.run(main())
+    assert max(in_flight) == 4
+    assert display._unacked == 0
+    # A write and a refresh per line
+    assert display.uart.written.count(display._SYS_CMD_REFRESH) == 8
+
+
+def test_other_tasks_run_while_waiting():
+    display = _display(latency=0.02, max_in_flight=0)
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.002)
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        await display.aclear_display()
+        task.cancel()
+
+    asyncio.run(main())
+    assert len(ticks) > 2
+
+
+def test_acommit_waits_for_each_queued_reply():
+    display = _display(max_in_flight=0)
+    display.begin()
+    display.write_line("one", "large", 1)
+    display.write_line("two", "large", 2)
+    asyncio.run(display.acommit())
+    assert display._unacked == 0
+    assert display.uart.written.count(display._SYS_CMD_REFRESH) == 1
+
+
+def test_timeout_when_the_display_does_not_reply():
+    display = _display(responder=lambda data: None, timeout=0.02)
+    with pytest.raises(EINK_timeout):
+        asyncio.run(display.ahand_shake())
+    assert isinstance(EINK_timeout(), eink.EINK_serial_not_ready)
+    # Font size, text and refresh
+    display.write_line("lost", "small", 1)
+    with pytest.raises(EINK_timeout, match="3 commands"):
+        asyncio.run(display.drain())
+    assert display._unacked == 0
+    assert display.stats()["timeouts"] == 2
+
+
+def test_rejected_command_raises():
+    display = _display(responder=lambda data: b"Er", max_in_flight=0)
+    with pytest.raises(eink.EINK_invalid_cmd):
+        asyncio.run(display.aclear_display())
@@ -0,0 +1,119 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Graph decimation and the frames a graph draws
+
+import asyncio
+import struct
+import pytest
+import sim
+import eink
+from eink_async import EINK_display_async
+from eink_graph import EINK_graph
+
+
+def _display(cls=eink.EINK_display):
+    display = cls(25, 26)
+    display.uart.responder = sim.eink_responder()
+    if cls is eink.EINK_display:
+        display.hand_shake()
+    display.enable_stats()
+    return (display)
+
+
+def _frames(data):
+    """Split sent bytes into (command, data bytes) tuples"""
+
+    frames = []
+    start = 0
+    while start < len(data):
+        length = struct.unpack_from(">H", data, start + 1)[0]
+        frames.append((data[start + 3], data[start + 4:start + length - 5]))
+        start += length
+    return (frames)
+
+
+def _drawn(display, graph, series):
+    start = len(display.uart.written)
+    graph.draw(series)
+    return (_frames(bytes(display.uart.written[start:])))
+
+
+def test_decimate_keeps_spikes():
+    graph = EINK_graph(_display(), 0, 0, 4, 10)
+    series = [5, 5, 5, 90, 5, 5, -3, 5]
+    assert graph.decimate(series) == [(5, 5), (5, 90), (5, 5), (-3, 5)]
+
+
+def test_decimate_short_series_one_column_each():
+    graph = EINK_graph(_display(), 0, 0, 100, 10)
+    assert graph.decimate([1, 2, 3]) == [(1, 1), (2, 2), (3, 3)]
+    assert graph.decimate([]) == []
+
+
+def test_too_small_refused():
+    with pytest.raises(eink.EINK_invalid_cmd):
+        EINK_graph(_display(), 0, 0, 1, 10)
+
+
+def test_draw_sends_one_write_and_refresh():
+    display = _display()
+    graph = EINK_graph(display, 10, 20, 50, 30)
+    writes = []
+    write = display.uart.write
+    display.uart.write = lambda data, length=None: (
+        writes.append(bytes(data)), write(data, length))[1]
+    graph.draw(list(range(200)))
+    assert len(writes) == 1
+    assert writes[0].count(display._SYS_CMD_REFRESH) == 1
+    assert display.stats()["refreshes"] == 1
+
+
+def test_draw_stays_in_the_box():
+    display = _display()
+    graph = EINK_graph(display, 10, 20, 50, 30, low=0, high=10)
+    frames = _drawn(display, graph, [-5, 0, 5, 10, 50] * 20)
+    commands = [command for command, data in frames]
+    assert commands[:4] == [display._DISPLAY_CMD_SET_COLOR,
+                            display._DISPLAY_CMD_FILL_RECT,
+                            display._DISPLAY_CMD_SET_COLOR,
+                            display._DISPLAY_CMD_RECT]
+    assert commands[-1] == display._SYS_CMD_REFRESH[3]
+    for command, data in frames:
+        if command in (display._DISPLAY_CMD_LINE,
+                       display._DISPLAY_CMD_POINT):
+            values = struct.unpack(">%dH" % (len(data) // 2), data)
+            assert all(10 <= x <= 59 for x in values[0::2])
+            assert all(20 <= y <= 49 for y in values[1::2])
+
+
+def test_empty_series_draws_the_box():
+    display = _display()
+    graph = EINK_graph(display, 0, 0, 20, 20, border=False)
+    commands = [command for command, data in _drawn(display, graph, [])]
+    assert commands == [display._DISPLAY_CMD_SET_COLOR,
+                        display._DISPLAY_CMD_FILL_RECT,
+                        display._DISPLAY_CMD_SET_COLOR,
+                        display._SYS_CMD_REFRESH[3]]
+
+
+def test_draw_forgets_lines_under_the_graph():
+    display = _display()
+    display.write_line("CO2 612", "small", 2)
+    display.write_line("PM 4", "small", 10)
+    EINK_graph(display, 0, 30, 100, 20).draw([1, 2, 3])
+    assert ("small", 2) not in display._lines
+    assert ("small", 10) in display._lines
+
+
+def test_adraw_waits_for_the_replies():
+    display = _display(EINK_display_async)
+    graph = EINK_graph(display, 0, 0, 40, 20)
+
+    async def main():
+        await display.ahand_shake()
+        await graph.adraw([3, 1, 4, 1, 5, 9, 2, 6])
+        await display.drain()
+
+    asyncio.run(main())
+    assert display._unacked == 0
+    assert display.stats()["timeouts"] == 0
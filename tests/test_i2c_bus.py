@@ -0,0 +1,80 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Shared I2C buses and merged burst reads
+
+import pytest
+import i2c_bus
+
+
+@pytest.fixture(autouse=True)
+def no_buses(monkeypatch):
+    monkeypatch.setattr(i2c_bus, "_buses", {})
+
+
+def _bus():
+    bus = i2c_bus.get_bus(22, 21)
+    bus.enable_stats()
+    registers = bus.i2c.add_device(0x77)
+    registers[:] = bytes(range(256))
+    bus.i2c.add_device(0x44)[0:4] = b"\x01\x02\x03\x04"
+    return (bus)
+
+
+def test_get_bus_shares_one_bus_per_pin_pair():
+    bus = i2c_bus.get_bus(22, 21, freq=100000)
+    assert i2c_bus.get_bus(22, 21, freq=400000) is bus
+    assert bus.i2c.freq == 100000
+    assert i2c_bus.get_bus(19, 18) is not bus
+
+
+def test_get_bus_refuses_pin_in_use():
+    i2c_bus.get_bus(22, 21)
+    with pytest.raises(i2c_bus.I2C_bus_pin_in_use):
+        i2c_bus.get_bus(22, 19)
+    with pytest.raises(i2c_bus.I2C_bus_pin_in_use):
+        i2c_bus.get_bus(18, 21)
+
+
+def test_burst_merges_touching_reads():
+    bus = _bus()
+    burst = bus.burst([(0x77, 0x1D, 3), (0x77, 0x20, 2), (0x77, 0x1F, 4),
+                       (0x44, 0, 4), (0x77, 0x50, 1)])
+    # 0x1D-0x22 in one, 0x50 and the other device on their own
+    assert burst.transactions() == 3
+    results = burst.read()
+    assert [bytes(result) for result in results] == [
+        b"\x1d\x1e\x1f", b"\x20\x21", b"\x1f\x20\x21\x22",
+        b"\x01\x02\x03\x04", b"\x50"]
+    assert bus.i2c.transactions == 3
+    assert bus.stats()["transactions"] == 3
+    assert bus.stats()["bytes_read"] == 6 + 4 + 1
+
+
+def test_burst_read_reuses_its_buffers():
+    bus = _bus()
+    burst = bus.burst([(0x44, 0, 2)])
+    first = burst.read()[0]
+    assert isinstance(first, memoryview)
+    bus.i2c.devices[0x44][0] = 0xFF
+    second = burst.read()[0]
+    assert second is first
+    assert bytes(first) == b"\xff\x02"
+
+
+def test_missing_device_counts_an_error():
+    bus = _bus()
+    burst = bus.burst([(0x10, 0, 1)])
+    with pytest.raises(OSError):
+        burst.read()
+    assert bus.stats()["errors"] == 1
+    # The bus was released on the error
+    assert bus.readfrom_mem(0x44, 1, 2) == b"\x02\x03"
+
+
+def test_bme680_library_calls():
+    bus = _bus()
+    bus.write_byte_data(0x44, 8, 0x5A)
+    bus.write_i2c_block_data(0x44, 9, [1, 2])
+    assert bus.read_byte_data(0x44, 8) == 0x5A
+    assert bus.read_i2c_block_data(0x44, 8, 3) == b"\x5a\x01\x02"
+    assert bus.scan() == [0x44, 0x77]
@@ -0,0 +1,92 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : PM2.5 frame parsing
+
+import pytest
+import sim
+import pm25
+
+
+def _sensor(data):
+    sensor = pm25.PM25_sensor(25, 26)
+    sensor.enable_stats()
+    sensor.uart.feed(data, delay=0)
+    return (sensor)
+
+
+def test_frames_in_order():
+    sensor = _sensor(sim.pm25_frame(1, 2, 3) + sim.pm25_frame(4, 5, 6))
+    assert [frame[:3] for frame in sensor.frames()] == [(1, 2, 3),
+                                                        (4, 5, 6)]
+
+
+def test_read_sensor_returns_newest():
+    sensor = _sensor(sim.pm25_frame(1, 2, 3) + sim.pm25_frame(4, 5, 6))
+    assert sensor.read_sensor() == (4, 5, 6)
+
+
+def test_garbage_and_bad_checksum_skipped():
+    data = b"\x00\x42\x99" + sim.pm25_frame(7, 8, 9, checksum=1) + \
+        sim.pm25_frame(10, 11, 12)
+    sensor = _sensor(data)
+    assert [frame[:3] for frame in sensor.frames()] == [(10, 11, 12)]
+    stats = sensor.stats()
+    assert stats["frames"] == 1
+    assert stats["parse_failures"] >= 1
+
+
+def test_frame_split_across_reads():
+    frame = sim.pm25_frame(13, 14, 15)
+    sensor = _sensor(frame[:10])
+    assert list(sensor.frames()) == []
+    sensor.uart.feed(frame[10:], delay=0)
+    assert [frame[:3] for frame in sensor.frames()] == [(13, 14, 15)]
+
+
+def test_fractional_timeout():
+    sensor = _sensor(b"")
+    with pytest.raises(pm25.PM25_serial_not_ready):
+        sensor.read_sensor(timeout=0.2)
+
+
+def test_capture_decoder_matches_device_parser():
+    data = b"\x42" + sim.pm25_frame(1, 2, 3) + \
+        sim.pm25_frame(4, 5, 6, checksum=0) + sim.pm25_frame(7, 8, 9)
+    pytest.importorskip("numpy")
+    from pm25_capture import decode
+
+    frames = decode(data)
+    assert frames["pm1_0"].tolist() == [1, 7]
+    assert frames["pm2_5"].tolist() == [2, 8]
+    assert frames["pm10"].tolist() == [3, 9]
+    sensor = _sensor(data)
+    assert [frame[:3] for frame in sensor.frames()] == [(1, 2, 3),
+                                                        (7, 8, 9)]
+
+
+def _chained_frames(starts, size):
+    """Valid frames at each start, each starting inside the one before."""
+
+    data = bytearray(size)
+    for start in starts:
+        data[start:start + 4] = b"\x42\x4d\x00\x1c"
+    # Each checksum lies inside the next frame, so set them in order
+    for start in starts:
+        checksum = sum(data[start:start + 30]) & 0xFFFF
+        data[start + 30:start + 32] = checksum.to_bytes(2, "big")
+    return (bytes(data))
+
+
+def test_capture_decoder_keeps_frames_after_an_overlap():
+    data = _chained_frames((0, 20, 40), 72)
+    pytest.importorskip("numpy")
+    from pm25_capture import decode
+
+    counts = {}
+    frames = decode(data, counts=counts)
+    sensor = _sensor(data)
+    assert [frame[:3] for frame in sensor.frames()] == list(zip(
+        frames["pm1_0"].tolist(), frames["pm2_5"].tolist(),
+        frames["pm10"].tolist()))
+    assert frames["offset"].tolist() == [0, 40]
+    assert counts["overlapping"] == 1
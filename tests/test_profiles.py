@@ -0,0 +1,30 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Node profiles start on the simulated hardware
+
+import pytest
+import machine
+import sim
+import esp32_modules
+import eink
+import pm25
+from esp32_modules.profiles import PROFILES
+
+
+@pytest.mark.parametrize("name", sorted(PROFILES))
+def test_profile_first_reading(name):
+    drivers = esp32_modules.start(name)
+    for driver_name, driver in drivers.items():
+        if isinstance(driver, pm25.PM25_sensor):
+            driver.uart.feed(sim.pm25_frame(10, 12, 15), delay=0)
+        elif isinstance(driver, eink.EINK_display):
+            driver.uart.responder = sim.eink_responder()
+    for driver_name, driver in drivers.items():
+        getattr(driver, PROFILES[name][driver_name]["read"])()
+
+
+def test_shared_uart_is_taken():
+    sensor = pm25.PM25_sensor(25, 26)
+    eink.EINK_display(16, 17)
+    with pytest.raises(machine.UART_taken):
+        sensor.read_sensor(timeout=0)
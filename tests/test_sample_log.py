@@ -0,0 +1,86 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Sample log writing and recovery after a power cut
+
+import os
+import sample_log
+from sample_log_reader import read_segment
+
+
+def _read(path):
+    readings = []
+    bad_blocks = []
+    for name in sorted(os.listdir(path)):
+        readings += read_segment(os.path.join(path, name), bad_blocks)
+    return (readings, bad_blocks)
+
+
+def _write(log, start, count):
+    for i in range(count):
+        log.add("co2", start + i, now=start + i)
+    log.flush()
+
+
+def test_round_trip(tmp_path):
+    log = sample_log.Sample_log(str(tmp_path))
+    _write(log, 0, sample_log.RECORDS_PER_BLOCK + 5)
+    readings, bad_blocks = _read(str(tmp_path))
+    assert [value for now, channel, value in readings] == \
+        list(range(sample_log.RECORDS_PER_BLOCK + 5))
+    assert bad_blocks == []
+
+
+def test_torn_block_then_reboot(tmp_path):
+    log = sample_log.Sample_log(str(tmp_path))
+    _write(log, 0, 10)
+    segment = os.path.join(str(tmp_path), log.segments()[-1])
+    with open(segment, "ab") as torn:
+        torn.write(b"\xff" * 100)
+
+    log = sample_log.Sample_log(str(tmp_path))
+    _write(log, 100, 10)
+    readings, bad_blocks = _read(str(tmp_path))
+    assert [value for now, channel, value in readings] == \
+        list(range(10)) + list(range(100, 110))
+    assert bad_blocks == [sample_log.BLOCK_SIZE]
+
+
+def test_reader_finds_blocks_after_torn_bytes(tmp_path):
+    log = sample_log.Sample_log(str(tmp_path))
+    _write(log, 0, 10)
+    _write(log, 50, 10)
+    segment = os.path.join(str(tmp_path), log.segments()[-1])
+    with open(segment, "rb") as blocks:
+        data = blocks.read()
+    size = sample_log.BLOCK_SIZE
+    with open(segment, "wb") as blocks:
+        blocks.write(data[:size] + b"\x00" * 100 + data[size:])
+    readings, bad_blocks = _read(str(tmp_path))
+    assert [value for now, channel, value in readings] == \
+        list(range(10)) + list(range(50, 60))
+    assert bad_blocks == [size]
+
+
+def test_corrupt_block_skipped(tmp_path):
+    log = sample_log.Sample_log(str(tmp_path))
+    _write(log, 0, 10)
+    _write(log, 20, 10)
+    segment = os.path.join(str(tmp_path), log.segments()[-1])
+    with open(segment, "r+b") as blocks:
+        blocks.seek(sample_log.HEADER_SIZE + 3)
+        blocks.write(b"\x55")
+    readings, bad_blocks = _read(str(tmp_path))
+    assert [value for now, channel, value in readings] == \
+        list(range(20, 30))
+    assert bad_blocks == [0]
+
+
+def test_segments_rotate(tmp_path):
+    log = sample_log.Sample_log(str(tmp_path), segment_blocks=1,
+                                max_segments=2)
+    for start in range(0, 40, 10):
+        _write(log, start, 10)
+    assert len(log.segments()) == 2
+    readings, bad_blocks = _read(str(tmp_path))
+    assert [value for now, channel, value in readings] == \
+        list(range(20, 40))
@@ -0,0 +1,52 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Scheduler deadlines and error handling
+
+import pytest
+import scheduler
+
+
+def test_due_tasks_run_once():
+    tasks = scheduler.Scheduler()
+    values = []
+    tasks.add("a", lambda: 1, 10, callback=lambda name, value:
+              values.append((name, value)))
+    tasks.add("b", lambda: 2, 10)
+    wait = tasks.run_once()
+    assert values == [("a", 1)]
+    assert tasks.tasks[1].value == 2
+    assert 9000 < wait <= 10000
+    tasks.run_once()
+    assert tasks.stats()["a"]["runs"] == 1
+
+
+def test_zero_interval_rejected():
+    tasks = scheduler.Scheduler()
+    with pytest.raises(scheduler.Scheduler_invalid_interval):
+        tasks.add("a", lambda: 1, 0)
+
+
+def test_min_interval_applies():
+    tasks = scheduler.Scheduler()
+    task = tasks.add("a", lambda: 1, 0, min_interval=1)
+    assert task.interval_ms == 1000
+
+
+def test_failing_read_and_callback_do_not_stop_others():
+    def fail():
+        raise ValueError("not ready")
+
+    def bad_callback(name, value):
+        raise KeyError(name)
+
+    tasks = scheduler.Scheduler()
+    tasks.add("read", fail, 1)
+    tasks.add("callback", lambda: 1, 1, callback=bad_callback)
+    tasks.add("good", lambda: 2, 1)
+    tasks.run_once()
+    stats = tasks.stats()
+    assert stats["read"]["errors"] == 1
+    assert stats["callback"]["errors"] == 1
+    assert stats["good"] == {"runs": 1, "late": 0, "skipped": 0,
+                             "errors": 0}
+    assert isinstance(tasks.tasks[1].error, KeyError)
@@ -0,0 +1,218 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Telemetry against a local stand-in MQTT broker and HTTP server
+
+import json
+import socket
+import struct
+import threading
+import pytest
+import telemetry
+from sample_log import RECORD, RECORD_SIZE
+
+
+def _read(conn, count):
+    data = b""
+    while len(data) < count:
+        chunk = conn.recv(count - len(data))
+        if not chunk:
+            raise OSError("closed")
+        data += chunk
+    return (data)
+
+
+def _read_packet(conn):
+    packet_type = _read(conn, 1)[0]
+    length = 0
+    shift = 0
+    while True:
+        byte = _read(conn, 1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return (packet_type, _read(conn, length))
+
+
+class _Server:
+    """Accept connections on localhost, each handled in a thread."""
+
+    def __init__(self, handle):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.handle = handle
+        self.connections = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._run, args=(conn,),
+                             daemon=True).start()
+
+    def _run(self, conn):
+        try:
+            self.handle(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class _Broker(_Server):
+    """Stand-in MQTT broker, acks QoS 1 publishes while ack is True."""
+
+    def __init__(self):
+        self.messages = []
+        self.ack = True
+        super().__init__(self._mqtt)
+
+    def _mqtt(self, conn):
+        packet_type, body = _read_packet(conn)
+        assert packet_type == 0x10
+        conn.sendall(b"\x20\x02\x00\x00")
+        while True:
+            packet_type, body = _read_packet(conn)
+            topic_length = struct.unpack(">H", body[:2])[0]
+            topic = body[2:2 + topic_length].decode()
+            qos = packet_type >> 1 & 3
+            start = 2 + topic_length + (2 if qos else 0)
+            if qos and not self.ack:
+                continue
+            self.messages.append((topic, qos, body[start:]))
+            if qos:
+                conn.sendall(b"\x40\x02" + body[start - 2:start])
+
+
+class _HTTP(_Server):
+    """Stand-in HTTP server keeping the path, type and body of POSTs."""
+
+    def __init__(self):
+        self.posts = []
+        super().__init__(self._http)
+
+    def _http(self, conn):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            data += conn.recv(1024)
+        head, _, body = data.partition(b"\r\n\r\n")
+        lines = head.decode().split("\r\n")
+        headers = dict(line.split(": ", 1) for line in lines[1:])
+        body += _read(conn, int(headers["Content-Length"]) - len(body))
+        self.posts.append((lines[0].split()[1], headers["Content-Type"],
+                           body))
+        conn.sendall(b"HTTP/1.0 200 OK\r\n\r\n")
+
+
+@pytest.fixture
+def broker():
+    server = _Broker()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def http():
+    server = _HTTP()
+    yield server
+    server.close()
+
+
+def _records(payload):
+    count = struct.unpack_from("<BH", payload)[1]
+    return ([struct.unpack_from(RECORD, payload, 3 + i * RECORD_SIZE)
+             for i in range(count)])
+
+
+def _uplink(broker=None, http=None, **kwargs):
+    mqtt = None
+    if broker is not None:
+        mqtt = telemetry.MQTT_connection("127.0.0.1", broker.port,
+                                         timeout=0.5)
+    if http is not None:
+        http = telemetry.HTTP_connection(
+            "http://127.0.0.1:{0}/readings".format(http.port), timeout=1)
+    return (telemetry.Telemetry(mqtt, "sensors/node", http, **kwargs))
+
+
+def test_batches_published_over_one_connection(broker):
+    uplink = _uplink(broker, batch_size=3)
+    for i in range(6):
+        uplink.add("co2", 600 + i, now=i)
+    assert [topic for topic, qos, payload in broker.messages] == \
+        ["sensors/node"] * 2
+    assert all(qos == 1 for topic, qos, payload in broker.messages)
+    assert [value for now, channel, value in
+            _records(broker.messages[1][2])] == [603, 604, 605]
+    assert broker.connections == 1
+    uplink.close()
+
+
+def test_batch_kept_until_acknowledged(broker):
+    uplink = _uplink(broker, backoff=0)
+    uplink.add("co2", 600, now=1)
+    broker.ack = False
+    with pytest.raises(telemetry.Telemetry_publish_failed):
+        uplink.flush()
+    broker.ack = True
+    uplink.flush()
+    assert [_records(payload) for topic, qos, payload in broker.messages] \
+        == [[(1, 0, 600.0)]]
+    uplink.close()
+
+
+def test_http_fallback_and_backoff(http):
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    port = dead.getsockname()[1]
+    dead.close()
+    mqtt = telemetry.MQTT_connection("127.0.0.1", port, timeout=0.5)
+    uplink = telemetry.Telemetry(mqtt, http=telemetry.HTTP_connection(
+        "http://127.0.0.1:{0}/readings".format(http.port)), backoff=60)
+    uplink.add("pm2", 12, now=5)
+    uplink.flush()
+    path, content_type, body = http.posts[0]
+    assert (path, content_type) == ("/readings", "application/octet-stream")
+    assert _records(body) == [(5, 2, 12.0)]
+
+
+def test_backs_off_after_failure():
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    port = dead.getsockname()[1]
+    dead.close()
+    uplink = telemetry.Telemetry(telemetry.MQTT_connection(
+        "127.0.0.1", port, timeout=0.5), backoff=60)
+    uplink.add("co2", 1)
+    with pytest.raises(telemetry.Telemetry_publish_failed):
+        uplink.flush()
+    with pytest.raises(telemetry.Telemetry_publish_failed,
+                       match="Backing off"):
+        uplink.flush()
+
+
+def test_stats_published_as_json(broker):
+    uplink = _uplink(broker)
+    uplink.publish_stats("pm25", {"frames": 3})
+    topic, qos, payload = broker.messages[0]
+    assert topic == "sensors/node/stats/pm25"
+    assert json.loads(payload) == {"frames": 3}
+    uplink.close()
+
+
+def test_stats_over_http_go_to_their_own_path(http):
+    uplink = _uplink(http=http)
+    uplink.publish_stats("pm25", {"frames": 3})
+    path, content_type, body = http.posts[0]
+    assert path == "/readings/stats/pm25"
+    assert content_type == "application/json"
+    assert json.loads(body) == {"frames": 3}
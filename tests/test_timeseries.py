@@ -0,0 +1,55 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Fixed memory time series and rollups
+
+import pytest
+import timeseries
+
+
+def _store():
+    return (timeseries.Time_series(channels=("co2", "pm2"), raw=4,
+                                   rollups=((60, 3), (3600, 2))))
+
+
+def test_memory_fixed_when_created():
+    store = _store()
+    memory = store.memory()
+    for now in range(0, 10000, 7):
+        store.add("co2", now, now=now)
+    assert store.memory() == memory
+
+
+def test_raw_readings_wrap_oldest_first():
+    store = _store()
+    for now in range(6):
+        store.add("co2", now * 10, now=now)
+    assert store.readings("co2") == [(2, 20), (3, 30), (4, 40), (5, 50)]
+    assert store.latest("co2") == (5, 50)
+    assert store.latest("pm2") is None
+
+
+def test_rollups_min_max_avg():
+    store = _store()
+    for now, value in ((0, 10), (30, 20), (59, 30), (60, 5), (90, 15)):
+        store.add("co2", value, now=now)
+    assert store.rollup("co2", 60, now=90) == [(0, 10, 30, 20),
+                                               (60, 5, 15, 10)]
+
+
+def test_old_periods_overwritten():
+    store = _store()
+    store.add("co2", 100, now=0)
+    store.add("co2", 1, now=180)
+    store.add("co2", 2, now=240)
+    assert store.rollup("co2", 60, now=240) == [
+        (180, 1, 1, 1), (240, 2, 2, 2)]
+    store.add("co2", 3, now=10000)
+    assert store.rollup("co2", 60, now=10000) == [(9960, 3, 3, 3)]
+
+
+def test_unknown_channel_and_rollup():
+    store = _store()
+    with pytest.raises(timeseries.Time_series_unknown_channel):
+        store.add("nope", 1)
+    with pytest.raises(timeseries.Time_series_unknown_rollup):
+        store.rollup("co2", 900)
@@ -0,0 +1,108 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : WiFi connect, fast reconnect and the watchdog
+
+import asyncio
+import pytest
+import network
+import wifi_setup
+
+_AP = (b"home", b"\x02\x00\x00\x00\x00\x07", 11, -40, 3, 0)
+
+
+@pytest.fixture(autouse=True)
+def _wlan(monkeypatch):
+    monkeypatch.setattr(network.WLAN, "connect_time", 0.05)
+    monkeypatch.setattr(network.WLAN, "scan_time", 0)
+    monkeypatch.setattr(network.WLAN, "access_points",
+                        [(b"other", b"\x01" * 6, 1, -30, 3, 0), _AP])
+
+
+def _wifi(**kwargs):
+    wifi = wifi_setup.WIFI_setup("home", "secret", **kwargs)
+    wifi.enable_stats()
+    return (wifi)
+
+
+def test_connect_does_not_scan_by_default():
+    wifi = _wifi()
+    wifi.connect()
+    assert wifi.isconnected()
+    assert wifi.bssid is None
+    assert wifi.stats()["access_point_scans"] == 0
+    assert wifi.stats()["connect_wait_ms"] >= 40
+
+
+def test_scan_finds_the_ssid_and_next_connect_uses_it():
+    wifi = _wifi()
+    wifi.connect(scan=True)
+    assert (wifi.bssid, wifi.channel) == (_AP[1], _AP[2])
+    wifi.connect(scan=True)
+    assert wifi.wlan.connect_args[2] == _AP[1]
+    assert wifi.wlan.settings["channel"] == _AP[2]
+    assert wifi.stats()["access_point_scans"] == 1
+
+
+def test_failed_connect_forgets_access_point(monkeypatch):
+    monkeypatch.setattr(network.WLAN, "connect_time", None)
+    wifi = _wifi(bssid=_AP[1], channel=_AP[2])
+    with pytest.raises(wifi_setup.WiFi_connection_issue):
+        wifi.connect(timeout=0.1)
+    assert wifi.bssid is None and wifi.channel is None
+    assert wifi.stats()["connection_issues"] == 1
+
+
+def test_access_point_kept_across_deep_sleep():
+    wifi = _wifi(bssid=_AP[1], channel=_AP[2])
+    woken = _wifi()
+    woken.load_state(wifi.save_state())
+    assert (woken.bssid, woken.channel) == (_AP[1], _AP[2])
+
+
+def test_aconnect_lets_other_tasks_run():
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.005)
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        wifi = _wifi()
+        await wifi.aconnect()
+        task.cancel()
+        return (wifi)
+
+    wifi = asyncio.run(main())
+    assert wifi.isconnected()
+    assert len(ticks) > 3
+    assert wifi.stats()["access_point_scans"] == 0
+
+
+def test_watchdog_reconnects_and_survives_os_error():
+    wifi = _wifi()
+    wifi.connect()
+    failures = []
+
+    def connect(*args, **kwargs):
+        if not failures:
+            failures.append(1)
+            raise OSError("Wifi Internal Error")
+        network.WLAN.connect(wifi.wlan, *args, **kwargs)
+
+    async def main():
+        wifi.wlan.disconnect()
+        wifi.wlan.connect = connect
+        task = asyncio.create_task(wifi.watchdog(interval=0.01,
+                                                 timeout=1))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if wifi.isconnected():
+                break
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(main())
+    assert failures == [1]
+    assert wifi.isconnected()
@@ -0,0 +1,231 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Keep recent sensor readings in fixed memory
+
+from array import array
+from time import time
+
+"""Time series store, recent readings and min/max/avg rollups per channel
+
+Exported class's:
+Rollup -- min, max and average of a channel per period
+Channel -- recent readings and rollups of one value
+Time_series -- a channel for each sensor value
+
+"""
+
+
+class Time_series_unknown_channel(Exception):
+    pass
+
+
+class Time_series_unknown_rollup(Exception):
+    pass
+
+
+class Rollup:
+    def __init__(self, period, slots):
+        """Set up the rollup.
+
+        Keyword arguments:
+        period -- seconds covered by each slot
+        slots -- number of periods kept
+
+
+        """
+
+        self.period = period
+        # Period number (time divided by period) each slot holds, -1 if empty
+        self._periods = array('l', [-1] * slots)
+        self._min = array('f', [0] * slots)
+        self._max = array('f', [0] * slots)
+        self._sum = array('f', [0] * slots)
+        self._count = array('H', [0] * slots)
+
+    def memory(self):
+        """Bytes used by the slots"""
+
+        slots = len(self._periods)
+        return (slots * (4 + 4 + 4 + 4 + 2))
+
+    def add(self, value, now):
+        """Add a value read at time now (seconds)."""
+
+        period = now // self.period
+        i = period % len(self._periods)
+        if self._periods[i] != period:
+            # The slot holds an older period, start it again
+            self._periods[i] = period
+            self._min[i] = value
+            self._max[i] = value
+            self._sum[i] = value
+            self._count[i] = 1
+            return
+        if value < self._min[i]:
+            self._min[i] = value
+        if value > self._max[i]:
+            self._max[i] = value
+        self._sum[i] += value
+        if self._count[i] < 0xFFFF:
+            self._count[i] += 1
+
+    def series(self, now):
+        """Get the kept periods up to now, oldest first.
+
+        Returns:
+        list -- tuples of period start time, min, max, avg
+
+        """
+
+        slots = len(self._periods)
+        last = now // self.period
+        result = []
+        for period in range(last - slots + 1, last + 1):
+            i = period % slots
+            if self._periods[i] == period and self._count[i]:
+                result.append((period * self.period, self._min[i],
+                               self._max[i], self._sum[i] / self._count[i]))
+        return (result)
+
+
+class Channel:
+    def __init__(self, raw, rollups):
+        """Set up the channel.
+
+        Keyword arguments:
+        raw -- number of recent readings kept as they are
+        rollups -- (period seconds, slots) for each rollup
+
+
+        """
+
+        self._times = array('l', [0] * raw)
+        self._values = array('f', [0] * raw)
+        self._index = 0
+        self._count = 0
+        self.rollups = {}
+        for period, slots in rollups:
+            self.rollups[period] = Rollup(period, slots)
+
+    def memory(self):
+        """Bytes used by the readings and rollups"""
+
+        total = len(self._values) * (4 + 4)
+        for rollup in self.rollups.values():
+            total += rollup.memory()
+        return (total)
+
+    def add(self, value, now):
+        """Add a value read at time now (seconds)."""
+
+        self._times[self._index] = now
+        self._values[self._index] = value
+        self._index = (self._index + 1) % len(self._values)
+        if self._count < len(self._values):
+            self._count += 1
+        for rollup in self.rollups.values():
+            rollup.add(value, now)
+
+    def latest(self):
+        """Get the newest reading, returns a tuple of time, value or None"""
+
+        if self._count == 0:
+            return (None)
+        i = (self._index - 1) % len(self._values)
+        return ((self._times[i], self._values[i]))
+
+    def readings(self):
+        """Get the kept readings, oldest first, as tuples of time, value"""
+
+        size = len(self._values)
+        start = (self._index - self._count) % size
+        result = []
+        for n in range(self._count):
+            i = (start + n) % size
+            result.append((self._times[i], self._values[i]))
+        return (result)
+
+
+class Time_series:
+    # One channel for each value the drivers read
+    CHANNELS = ("co2", "pm1", "pm2", "pm10", "temperature", "pressure",
+                "humidity", "gas_resistance", "iaq")
+    # Rollup period in seconds and slots kept, 1 hour of 1 minute
+    # rollups and 24 hours of 15 minute and 1 hour rollups
+    ROLLUPS = ((60, 60), (900, 96), (3600, 24))
+
+    def __init__(self, channels=CHANNELS, raw=60, rollups=ROLLUPS):
+        """Set up the store, all memory is allocated here.
+
+        Keyword arguments:
+        channels -- names of the channels to keep
+        raw -- number of recent readings kept as they are per channel
+        rollups -- (period seconds, slots) for each rollup
+
+
+        """
+
+        self.channels = {}
+        for name in channels:
+            self.channels[name] = Channel(raw, rollups)
+
+    def memory(self):
+        """Bytes used by all channels, fixed when the store is created"""
+
+        total = 0
+        for channel in self.channels.values():
+            total += channel.memory()
+        return (total)
+
+    def _channel(self, name):
+        try:
+            return (self.channels[name])
+        except KeyError:
+            raise Time_series_unknown_channel("Unknown channel {0}".format(
+                name))
+
+    def add(self, name, value, now=None):
+        """Add a reading to a channel.
+
+        Keyword arguments:
+        name -- channel name
+        value -- the reading
+        now -- time of the reading in seconds, defaults to now
+
+
+        """
+
+        if now is None:
+            now = int(time())
+        self._channel(name).add(value, now)
+
+    def latest(self, name):
+        """Get the newest reading of a channel, as time, value or None"""
+
+        return (self._channel(name).latest())
+
+    def readings(self, name):
+        """Get the recent readings of a channel, oldest first"""
+
+        return (self._channel(name).readings())
+
+    def rollup(self, name, period, now=None):
+        """Get the rollups of a channel, oldest first.
+
+        Keyword arguments:
+        name -- channel name
+        period -- rollup period in seconds, such as 60, 900 or 3600
+        now -- time of the newest period to include, defaults to now
+
+        Returns:
+        list -- tuples of period start time, min, max, avg
+
+        """
+
+        channel = self._channel(name)
+        if period not in channel.rollups:
+            raise Time_series_unknown_rollup("No {0}s rollup for {1}".format(
+                period, name))
+        if now is None:
+            now = int(time())
+        return (channel.rollups[period].series(now))
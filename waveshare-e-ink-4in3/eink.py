@@ -3,6 +3,7 @@
 # Description : Control the Wave Share 4.2" e-ink display
 
 from machine import UART
+from driver_stats import Driver_stats
 from time import sleep
 
 
@@ -18,27 +19,88 @@ class EINK_invalid_line_position(Exception):
     pass
 
 
-class EINKBase:
-    def __init__(self, rx_pin, tx_pin):
+class EINKBase(Driver_stats):
+    def __init__(self, rx_pin, tx_pin, uart_id=1):
         """Initialize the sensor.
 
         Keyword arguments:
         rx_pin -- pin number of the rx pin
         tx_pin -- pin number of the tx pin
+        uart_id -- hardware UART to use, each device needs its own
 
 
         """
 
         # Set up the serial port according to the docs
-        uart = UART(1)
+        uart = UART(uart_id)
         uart.init(115200, bits=8, parity=None, stop=1, rx=rx_pin, tx=tx_pin)
         self.uart = uart
 
+        # Pending command frames while a batch is open, None otherwise
+        self._batch = None
+        # Shadow copy of the text shown in each (size, line_number) slot
+        self._lines = {}
+        # Font size last set on the display, None if not known
+        self._font_size = None
+        # Counters, None while counting is off
+        self._stats = None
+
+    def save_state(self):
+        """Get what the panel shows, to keep across a deep sleep
+
+        Returns:
+        list -- font size, then a [size, line number, text] list per line.
+                Lines written as bytes are kept as text, lines that are
+                not valid UTF-8 are left out and sent again after waking
+
+        """
+
+        lines = []
+        for slot, text in self._lines.items():
+            if isinstance(text, bytes):
+                try:
+                    text = text.decode()
+                except UnicodeError:
+                    continue
+            lines.append([slot[0], slot[1], text])
+        return ([self._font_size, lines])
+
+    def load_state(self, state):
+        """Restore the state from save_state()
+
+        The panel keeps its image while the ESP32 sleeps, so lines that
+        still show the same text are not sent again.
+
+        """
+
+        self._font_size = state[0]
+        self._lines = {}
+        for size, line_number, text in state[1]:
+            self._lines[(size, line_number)] = text
+
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("uart_bytes_out", "uart_bytes_in", "frames", "refreshes",
+                   "lines_skipped", "sleep_ms", "serial_not_ready")
+
+    def _wait_reply(self, count, wait_ms):
+        """Sleep while the controller replies, then read count bytes."""
+
+        sleep(wait_ms / 1000)
+        reply = self.uart.read(count)
+        stats = self._stats
+        if stats is not None:
+            stats["sleep_ms"] += wait_ms
+            if reply:
+                stats["uart_bytes_in"] += len(reply)
+        return (reply)
+
 
 class EINK_display(EINKBase):
     # See manual section 3.1.2 command frame format
     _FRAME_END = bytes([0xCC, 0x33, 0xC3, 0x3C])
-    _FRAME_HEADER = bytes([0xA5])
+    _FRAME_HEADER = 0xA5
+    # XOR of the header and frame end, the fixed part of every parity byte
+    _FRAME_FIXED_PARITY = 0xA5 ^ 0xCC ^ 0x33 ^ 0xC3 ^ 0x3C
 
     # See manual section 3.2.2 command expiation
     _SYS_CMD_HANDSHAKE = \
@@ -57,43 +119,223 @@ class EINK_display(EINKBase):
         bytes([0xA5, 0x00, 0x0A, 0x1E, 0x03, 0xCC, 0x33, 0xC3, 0x3C, 0xB2])
     _SYS_CMD_GET_ENG_FONT_SIZE = \
         bytes([0xA5, 0x00, 0x09, 0x1D, 0xCC, 0x33, 0xC3, 0x3C, 0xB1])
-    _DISPLAY_CMD_STRING = bytes([0x30])
-    _PADDING = bytes([0x00])
+    _DISPLAY_CMD_STRING = 0x30
+    _DISPLAY_CMD_SET_COLOR = 0x10
+    _DISPLAY_CMD_POINT = 0x20
+    _DISPLAY_CMD_LINE = 0x22
+    _DISPLAY_CMD_FILL_RECT = 0x24
+    _DISPLAY_CMD_RECT = 0x25
+    _DISPLAY_CMD_CIRCLE = 0x26
+    _DISPLAY_CMD_FILL_CIRCLE = 0x27
+
+    # Colours for set_color(), see manual section 3.2.2
+    BLACK = 0x00
+    DARK_GRAY = 0x01
+    LIGHT_GRAY = 0x02
+    WHITE = 0x03
+
+    # Bytes we can expect back as valid font indexes
+    _FONT_INDEXES = {b'1': "small", b'11': "small",
+                     b'2': "medium", b'22': "medium",
+                     b'3': "large", b'33': "large"}
+
+    # Pixel height of each line, and the number of lines that fit
+    _LINE_HEIGHTS = {"small": 30, "medium": 50, "large": 60}
+    _MAX_LINES = {"small": 21, "medium": 13, "large": 10}
+
+    # Longest string we will put in a single frame
+    _MAX_STRING_LENGTH = 256
+    # header, length, command, x, y, null, frame end and parity
+    _MAX_FRAME_LENGTH = _MAX_STRING_LENGTH + 14
+
+    def __init__(self, rx_pin, tx_pin, uart_id=1):
+        super().__init__(rx_pin, tx_pin, uart_id)
+
+        # One frame buffer reused for every command, sent with
+        # uart.write(buffer, length) so no slice of it is made
+        self._frame = bytearray(self._MAX_FRAME_LENGTH)
+        self._frame_view = memoryview(self._frame)
+        self._frame[0] = self._FRAME_HEADER
+
+    def _calculate_parity(self, frame, start=0, end=None, parity=0):
+        """Calculate the parity bit, from frame header to frame end.
+
+        Keyword arguments:
+        frame -- bytes to XOR together
+        start -- index of the first byte to include
+        end -- index after the last byte to include, defaults to the end
+        parity -- parity of any bytes already accounted for
 
-    def _calculate_parity(self, frame):
-        """Calculate the parity bit, from frame header to frame end."""
 
-        # Set the initial parity to zero so we have something to XOR
-        parity = 0
+        """
+
+        if end is None:
+            end = len(frame)
         # For each byte in the frame, XOR it against the previous parity value
-        for byte in frame:
-            parity ^= byte
+        for i in range(start, end):
+            parity ^= frame[i]
         return(parity)
 
+    def _put_u16(self, offset, value):
+        """Store a two byte big endian value in the frame buffer."""
+
+        self._frame[offset] = (value >> 8) & 0xFF
+        self._frame[offset + 1] = value & 0xFF
+
+    def _send_frame(self, command, end):
+        """Finish the frame in the buffer and send it.
+
+        Keyword arguments:
+        command -- command byte, see manual section 3.2.2
+        end -- index after the last data byte in the frame buffer
+
+
+        """
+
+        # frame length counts everything, including the frame end and parity
+        frame = self._frame
+        length = end + 5
+        self._put_u16(1, length)
+        frame[3] = command
+        frame_end = self._FRAME_END
+        frame[end] = frame_end[0]
+        frame[end + 1] = frame_end[1]
+        frame[end + 2] = frame_end[2]
+        frame[end + 3] = frame_end[3]
+
+        # header and frame end parity is fixed, only XOR the variable part
+        frame[end + 4] = self._calculate_parity(
+            frame, 1, end, self._FRAME_FIXED_PARITY)
+        self._write(frame, length)
+
+    def _write(self, frame, length=None):
+        """Send a frame, or queue it if a batch is open.
+
+        Keyword arguments:
+        frame -- buffer holding the frame
+        length -- bytes of the buffer to send, all of them if None
+
+
+        """
+
+        if length is None:
+            length = len(frame)
+        if self._batch is None:
+            self.uart.write(frame, length)
+        elif length == len(frame):
+            self._batch.extend(frame)
+        else:
+            self._batch.extend(self._frame_view[:length])
+        stats = self._stats
+        if stats is not None:
+            stats["frames"] += 1
+            if self._batch is None:
+                stats["uart_bytes_out"] += length
+
+    def _refresh(self):
+        """Refresh the display, deferred to commit() if a batch is open."""
+
+        if self._batch is None:
+            self.uart.write(self._SYS_CMD_REFRESH)
+            stats = self._stats
+            if stats is not None:
+                stats["refreshes"] += 1
+                stats["uart_bytes_out"] += len(self._SYS_CMD_REFRESH)
+
+    def begin(self):
+        """Start a batch of display updates.
+
+        Frames from write_string(), write_line(), set_font_size() and
+        clear_display() are queued until commit() is called.
+
+
+        """
+
+        if self._batch is not None:
+            raise EINK_invalid_cmd("Batch already started")
+        self._batch = bytearray()
+
+    def commit(self):
+        """Send all queued frames in one UART write and refresh once."""
+
+        if self._batch is None:
+            raise EINK_invalid_cmd("No batch started")
+        batch = self._batch
+        self._batch = None
+        # Nothing changed, so skip the refresh completely
+        if not batch:
+            return
+        batch.extend(self._SYS_CMD_REFRESH)
+        self.uart.write(batch)
+        stats = self._stats
+        if stats is not None:
+            stats["refreshes"] += 1
+            stats["uart_bytes_out"] += len(batch)
+
+    def abort(self):
+        """Drop all queued frames without sending them."""
+
+        self._batch = None
+        # The shadow and font size may hold state that was never sent
+        self._lines = {}
+        self._font_size = None
+
+    def invalidate(self):
+        """Forget what write_line() has shown, so every line is re-sent."""
+
+        self._lines = {}
+
+    def _forget(self, y0, y1):
+        """Forget the lines drawn over by rows y0 to y1, inclusive."""
+
+        lines = self._lines
+        if not lines:
+            return
+        heights = self._LINE_HEIGHTS
+        # Only allocate when a line is actually drawn over
+        covered = None
+        for slot in lines:
+            height = heights[slot[0]]
+            y_pos = (slot[1] - 1) * height
+            if y_pos <= y1 and y_pos + height > y0:
+                if covered is None:
+                    covered = [slot]
+                else:
+                    covered.append(slot)
+        if covered is not None:
+            for slot in covered:
+                del lines[slot]
+
     def hand_shake(self):
         """Try handshake with the e-ink controller.
 
         Returns OK as two bytes if the handshake was successful
+        The cached font size is re-read from the display
 
 
         """
 
         self.uart.write(self._SYS_CMD_HANDSHAKE)
+        if self._stats is not None:
+            self._stats["uart_bytes_out"] += len(self._SYS_CMD_HANDSHAKE)
 
         # the e-ink controller takes around 100ms to reply
-        sleep(0.100)
-        hand_shake_status = self.uart.read(2)
-        if hand_shake_status.decode() == "OK":
+        hand_shake_status = self._wait_reply(2, 100)
+        if hand_shake_status == b"OK":
+            self._font_size = self._query_font_size()
             return (hand_shake_status)
         else:
+            if self._stats is not None:
+                self._stats["serial_not_ready"] += 1
             raise EINK_serial_not_ready("Handshake failed")
 
     def clear_display(self):
         """Clear the display, takes no arguments."""
 
         # send the clear display command , followed by an screen update
-        self.uart.write(self._SYS_CMD_CLEAR_SCREEN)
-        self.uart.write(self._SYS_CMD_REFRESH)
+        self._write(self._SYS_CMD_CLEAR_SCREEN)
+        self._refresh()
+        self._lines = {}
 
     def set_font_size(self, size):
         """Set the English display font size.
@@ -101,93 +343,181 @@ class EINK_display(EINKBase):
         Keyword arguments:
         size -- font size small,medium and large
 
+        Nothing is sent if the display already uses that size.
+
 
         """
+        if size == self._font_size:
+            return
+
         # write a command to the display to set the size based on args
-        # Only changed once per update
         if size == "small":
-            self.uart.write(self._SYS_CMD_ENG_FONT_SIZE_32)
+            self._write(self._SYS_CMD_ENG_FONT_SIZE_32)
         elif size == "medium":
-            self.uart.write(self._SYS_CMD_ENG_FONT_SIZE_48)
+            self._write(self._SYS_CMD_ENG_FONT_SIZE_48)
         elif size == "large":
-            self.uart.write(self._SYS_CMD_ENG_FONT_SIZE_64)
+            self._write(self._SYS_CMD_ENG_FONT_SIZE_64)
         else:
             raise EINK_invalid_cmd("Invalid size command")
+        self._font_size = size
 
     def get_font_size(self):
         """Get the currently set font size
 
         Takes no arguments, returns the currently set font size
+        Only asks the display if the size is not already known
 
         """
 
-        # List of bytes we can expect as valid front index's
-        _VALID_FONT_INDEXES = [b'1', b'2', b'3', b'11', b'22', b'33']
+        if self._font_size is None:
+            self._font_size = self._query_font_size()
+        return (self._font_size)
+
+    def _query_font_size(self):
+        """Ask the display for the font size, returns None if unknown."""
 
         # query the display for the font size
         self.uart.write(self._SYS_CMD_GET_ENG_FONT_SIZE)
+        if self._stats is not None:
+            self._stats["uart_bytes_out"] += len(
+                self._SYS_CMD_GET_ENG_FONT_SIZE)
         # sleep to ensure the command returns, then read the result
-        sleep(0.100)
-        current_font_index = self.uart.read(2)
+        current_font_index = self._wait_reply(2, 100)
         # If we get "OK" back means we need to re-read the serial line
         # for the actual returned value
         if current_font_index == b"OK":
-            current_font_index = self.uart.read(2)
-            self.get_font_size()
+            current_font_index = self._wait_reply(2, 0)
         # Match a font index and return the English size name
-        if current_font_index in _VALID_FONT_INDEXES:
-            if (current_font_index == b'1') or (current_font_index == b'11'):
-                return("small")
-            if (current_font_index == b'2') or (current_font_index == b'22'):
-                return("medium")
-            if (current_font_index == b'3') or (current_font_index == b'33'):
-                return("large")
-            else:
-                print("no size")
+        return (self._FONT_INDEXES.get(current_font_index))
+
+    def set_color(self, foreground, background):
+        """Set the colours used for drawing and text
+
+        Keyword arguments:
+        foreground -- BLACK, DARK_GRAY, LIGHT_GRAY or WHITE
+        background -- colour behind text, same choices
+
+
+        """
+
+        self._frame[4] = foreground
+        self._frame[5] = background
+        self._send_frame(self._DISPLAY_CMD_SET_COLOR, 6)
+
+    def draw_point(self, x_pos, y_pos):
+        """Draw a single pixel in the foreground colour"""
+
+        self._put_u16(4, x_pos)
+        self._put_u16(6, y_pos)
+        self._send_frame(self._DISPLAY_CMD_POINT, 8)
+        self._refresh()
+        self._forget(y_pos, y_pos)
+
+    def draw_line(self, x0, y0, x1, y1):
+        """Draw a line from x0, y0 to x1, y1"""
+
+        self._put_u16(4, x0)
+        self._put_u16(6, y0)
+        self._put_u16(8, x1)
+        self._put_u16(10, y1)
+        self._send_frame(self._DISPLAY_CMD_LINE, 12)
+        self._refresh()
+        self._forget(min(y0, y1), max(y0, y1))
+
+    def draw_rect(self, x0, y0, x1, y1, fill=False):
+        """Draw a rectangle with corners x0, y0 and x1, y1
+
+        Keyword arguments:
+        fill -- fill the rectangle instead of drawing its outline
+
+
+        """
+
+        self._put_u16(4, x0)
+        self._put_u16(6, y0)
+        self._put_u16(8, x1)
+        self._put_u16(10, y1)
+        if fill:
+            self._send_frame(self._DISPLAY_CMD_FILL_RECT, 12)
+        else:
+            self._send_frame(self._DISPLAY_CMD_RECT, 12)
+        self._refresh()
+        self._forget(min(y0, y1), max(y0, y1))
+
+    def draw_circle(self, x_pos, y_pos, radius, fill=False):
+        """Draw a circle centred on x_pos, y_pos
+
+        Keyword arguments:
+        fill -- fill the circle instead of drawing its outline
+
+
+        """
+
+        self._put_u16(4, x_pos)
+        self._put_u16(6, y_pos)
+        self._put_u16(8, radius)
+        if fill:
+            self._send_frame(self._DISPLAY_CMD_FILL_CIRCLE, 10)
+        else:
+            self._send_frame(self._DISPLAY_CMD_CIRCLE, 10)
+        self._refresh()
+        self._forget(y_pos - radius, y_pos + radius)
 
     def write_string(self, string, x_pos, y_pos):
         """Write a text string to the eink display
 
         Keyword arguments:
-        string -- Text string to write to the display
+        string -- Text string (or bytes) to write to the display
         x_pos -- X position of the start of the string
         y_pos -- Y position of the start of the string
 
 
         """
 
-        # convert the x and y pos into bytes
-        # x and y pos are two bytes wide
-        x_pos = x_pos.to_bytes(2, 'big')
-        y_pos = y_pos.to_bytes(2, 'big')
+        # see section 3.1.2, x and y pos are two bytes wide
+        # and only the string length is variable
+        if isinstance(string, str):
+            string = string.encode()
+        length = len(string)
+        if length > self._MAX_STRING_LENGTH:
+            raise EINK_invalid_cmd("String longer than {0} bytes".format(
+                self._MAX_STRING_LENGTH))
+
+        frame = self._frame
+        self._put_u16(4, x_pos)
+        self._put_u16(6, y_pos)
+        frame[8:8 + length] = string
+        # strings are null terminated
+        frame[8 + length] = 0x00
 
-        # convert the string into hex
-        string = bytes(string.encode('hex'))
+        # write the frame to the internal buffer, then update the eink display
+        # do not issue a clear, user should control when to clear the screen
+        # inside a batch the refresh is left to commit()
+        self._send_frame(self._DISPLAY_CMD_STRING, 9 + length)
+        self._refresh()
+        # Lines this covers no longer show what write_line() wrote
+        heights = self._LINE_HEIGHTS
+        height = heights.get(self._font_size, heights["large"])
+        self._forget(y_pos, y_pos + height - 1)
 
-        # get length of string add up total length of frame
-        # see section 3.1.2 only the string length is variable
-        # frame length is also two bytes wide
-        frame_length = len(string)
-        frame_length = frame_length + 14
-        frame_length = frame_length.to_bytes(2, 'big')
+    def line_position(self, size, line_number):
+        """Get the y position of a line, returns the pixel offset
 
-        # construct the pre parity bit frame
-        frame = self._FRAME_HEADER + frame_length + \
-            self._DISPLAY_CMD_STRING + x_pos + \
-            y_pos + string + self._PADDING + self._FRAME_END
+        Keyword arguments:
+        size -- font size (small, medium, large)
+        line_number -- vertical line number, max 10, 13, 21
 
-        # work out the parity bit
-        # parity bit is always one byte wide
-        parity_bit = self._calculate_parity(frame)
-        parity_bit = parity_bit.to_bytes(1, 'big')
 
-        # construct the complete frame
-        frame = frame + parity_bit
+        """
 
-        # write the frame to the internal buffer, then update the eink display
-        # do not issue a clear, user should control when to clear the screen
-        self.uart.write(frame)
-        self.uart.write(self._SYS_CMD_REFRESH)
+        if size not in self._MAX_LINES:
+            raise EINK_invalid_cmd("Invalid size command")
+        max_lines = self._MAX_LINES[size]
+        if not 1 <= line_number <= max_lines:
+            raise EINK_invalid_line_position("Invalid line number {0}, "
+                                             "max lines supported are {1}"
+                                             .format(line_number, max_lines))
+        return ((line_number - 1) * self._LINE_HEIGHTS[size])
 
     def write_line(self, string, size, line_number):
         """Write text based on a line number and size
@@ -197,126 +527,21 @@ class EINK_display(EINKBase):
         font size -- size of the font to use (small, medium, large)
         line number - vertical line number to write text to, max 10, 13, 21
 
+        Lines already showing the same text are not sent again. Lines
+        drawn over by write_string(), write_line() in another size or the
+        draw methods are sent again.
+
 
         """
 
-        # Define the maximum lines per font size
-        _large_font = [0, 60, 120, 180, 240, 300, 360, 420, 480, 540, 600]
-        _medium_font = [0, 50, 100, 150, 200, 250, 300, 350, 400, 450, 500,
-                        550, 600]
-        _small_font = [0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300,
-                       330, 360, 390, 420, 450, 480, 510, 540, 570, 600]
-
-        # Not a huge fan of the below if blocks
-        # will try find a cleaner, simpler way later
-        # for now just select a line number and write to it
-
-        if size == "large":
-            self.set_font_size("large")
-            _max_lines = 10
-            if line_number == 1:
-                self.write_string(string, _large_font[0], _large_font[0])
-            elif line_number == 2:
-                self.write_string(string, _large_font[0], _large_font[1])
-            elif line_number == 3:
-                self.write_string(string, _large_font[0], _large_font[2])
-            elif line_number == 4:
-                self.write_string(string, _large_font[0], _large_font[3])
-            elif line_number == 5:
-                self.write_string(string, _large_font[0], _large_font[4])
-            elif line_number == 6:
-                self.write_string(string, _large_font[0], _large_font[5])
-            elif line_number == 7:
-                self.write_string(string, _large_font[0], _large_font[6])
-            elif line_number == 8:
-                self.write_string(string, _large_font[0], _large_font[7])
-            elif line_number == 9:
-                self.write_string(string, _large_font[0], _large_font[8])
-            elif line_number == 10:
-                self.write_string(string, _large_font[0], _large_font[9])
-            else:
-                raise EINK_invalid_line_position("Invalid line number {0}, \
-                    max lines supported are {1}".format(line_number,
-                                                        _max_lines))
-        elif size == "medium":
-            self.set_font_size("medium")
-            _max_lines = 13
-            if line_number == 1:
-                self.write_string(string, _medium_font[0], _medium_font[0])
-            elif line_number == 2:
-                self.write_string(string, _medium_font[0], _medium_font[1])
-            elif line_number == 3:
-                self.write_string(string, _medium_font[0], _medium_font[2])
-            elif line_number == 4:
-                self.write_string(string, _medium_font[0], _medium_font[3])
-            elif line_number == 5:
-                self.write_string(string, _medium_font[0], _medium_font[4])
-            elif line_number == 6:
-                self.write_string(string, _medium_font[0], _medium_font[5])
-            elif line_number == 7:
-                self.write_string(string, _medium_font[0], _medium_font[6])
-            elif line_number == 8:
-                self.write_string(string, _medium_font[0], _medium_font[7])
-            elif line_number == 9:
-                self.write_string(string, _medium_font[0], _medium_font[8])
-            elif line_number == 10:
-                self.write_string(string, _medium_font[0], _medium_font[9])
-            elif line_number == 11:
-                self.write_string(string, _medium_font[0], _medium_font[10])
-            elif line_number == 12:
-                self.write_string(string, _medium_font[0], _medium_font[11])
-            elif line_number == 13:
-                self.write_string(string, _medium_font[0], _medium_font[12])
-            else:
-                raise EINK_invalid_line_position("Invalid line number {0}, \
-                    max lines supported are {1}".format(line_number,
-                                                        _max_lines))
-        elif size == "small":
-            self.set_font_size("small")
-            _max_lines = 21
-            if line_number == 1:
-                self.write_string(string, _small_font[0], _small_font[0])
-            elif line_number == 2:
-                self.write_string(string, _small_font[0], _small_font[1])
-            elif line_number == 3:
-                self.write_string(string, _small_font[0], _small_font[2])
-            elif line_number == 4:
-                self.write_string(string, _small_font[0], _small_font[3])
-            elif line_number == 5:
-                self.write_string(string, _small_font[0], _small_font[4])
-            elif line_number == 6:
-                self.write_string(string, _small_font[0], _small_font[5])
-            elif line_number == 7:
-                self.write_string(string, _small_font[0], _small_font[6])
-            elif line_number == 8:
-                self.write_string(string, _small_font[0], _small_font[7])
-            elif line_number == 9:
-                self.write_string(string, _small_font[0], _small_font[8])
-            elif line_number == 10:
-                self.write_string(string, _small_font[0], _small_font[9])
-            elif line_number == 11:
-                self.write_string(string, _small_font[0], _small_font[10])
-            elif line_number == 12:
-                self.write_string(string, _small_font[0], _small_font[11])
-            elif line_number == 13:
-                self.write_string(string, _small_font[0], _small_font[12])
-            elif line_number == 14:
-                self.write_string(string, _small_font[0], _small_font[13])
-            elif line_number == 15:
-                self.write_string(string, _small_font[0], _small_font[14])
-            elif line_number == 16:
-                self.write_string(string, _small_font[0], _small_font[15])
-            elif line_number == 17:
-                self.write_string(string, _small_font[0], _small_font[16])
-            elif line_number == 18:
-                self.write_string(string, _small_font[0], _small_font[17])
-            elif line_number == 19:
-                self.write_string(string, _small_font[0], _small_font[18])
-            elif line_number == 20:
-                self.write_string(string, _small_font[0], _small_font[19])
-            elif line_number == 21:
-                self.write_string(string, _small_font[0], _small_font[20])
-            else:
-                raise EINK_invalid_line_position("Invalid line number {0}, \
-                    max lines supported are {1}".format(line_number,
-                                                        _max_lines))
+        # Skip the frame and the refresh if the slot is unchanged
+        slot = (size, line_number)
+        if self._lines.get(slot) == string:
+            if self._stats is not None:
+                self._stats["lines_skipped"] += 1
+            return
+
+        y_pos = self.line_position(size, line_number)
+        self.set_font_size(size)
+        self.write_string(string, 0, y_pos)
+        self._lines[slot] = string
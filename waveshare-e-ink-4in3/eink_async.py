@@ -0,0 +1,201 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Non blocking control of the Wave Share 4.2" e-ink display
+
+import uasyncio
+from time import ticks_ms, ticks_diff
+from eink import EINK_display, EINK_invalid_cmd, EINK_serial_not_ready
+
+"""Async e-ink display, awaits the controller replies instead of sleeping
+
+Exported class's:
+EINK_display_async -- EINK_display with awaitable methods
+
+"""
+
+
+class EINK_timeout(EINK_serial_not_ready):
+    pass
+
+
+class EINK_display_async(EINK_display):
+    # Also count time spent waiting for replies, and replies that never came
+    _STAT_NAMES = EINK_display._STAT_NAMES + ("reply_wait_ms", "timeouts")
+
+    def __init__(self, rx_pin, tx_pin, max_in_flight=4, timeout=1,
+                 uart_id=1):
+        """Initialize the display.
+
+        Keyword arguments:
+        rx_pin -- pin number of the rx pin
+        tx_pin -- pin number of the tx pin
+        max_in_flight -- commands sent before waiting for their "OK"
+        timeout -- seconds to wait for each reply
+        uart_id -- hardware UART to use, each device needs its own
+
+
+        """
+
+        super().__init__(rx_pin, tx_pin, uart_id)
+        self._reader = uasyncio.StreamReader(self.uart)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+        # Commands sent that the controller has not replied "OK" to yet
+        self._unacked = 0
+        # Commands queued in the open batch
+        self._queued = 0
+
+    def _write(self, frame, length=None):
+        """Send or queue a frame, counting the reply it will get."""
+
+        super()._write(frame, length)
+        if self._batch is None:
+            self._unacked += 1
+        else:
+            self._queued += 1
+
+    def _refresh(self):
+        """Refresh the display, counting the reply it will get."""
+
+        if self._batch is None:
+            super()._refresh()
+            self._unacked += 1
+
+    def begin(self):
+        super().begin()
+        self._queued = 0
+
+    def commit(self):
+        # every queued command and the refresh gets its own reply
+        sending = self._batch is not None and len(self._batch) > 0
+        super().commit()
+        if sending:
+            self._unacked += self._queued + 1
+        self._queued = 0
+
+    def abort(self):
+        super().abort()
+        self._queued = 0
+
+    def _send(self, command):
+        """Write a command whose reply is read straight away."""
+
+        self.uart.write(command)
+        if self._stats is not None:
+            self._stats["uart_bytes_out"] += len(command)
+
+    async def _read_reply(self, exact=True):
+        """Read the next reply from the controller.
+
+        Keyword arguments:
+        exact -- wait for two bytes, otherwise return what arrives first
+
+
+        """
+
+        if exact:
+            reply = self._reader.readexactly(2)
+        else:
+            reply = self._reader.read(2)
+        stats = self._stats
+        if stats is not None:
+            start = ticks_ms()
+        try:
+            reply = await uasyncio.wait_for(reply, self.timeout)
+            if stats is not None:
+                stats["reply_wait_ms"] += ticks_diff(ticks_ms(), start)
+                stats["uart_bytes_in"] += len(reply)
+            return (reply)
+        except uasyncio.TimeoutError:
+            if stats is not None:
+                stats["reply_wait_ms"] += ticks_diff(ticks_ms(), start)
+                stats["timeouts"] += 1
+            # the missing replies are not coming, start counting again
+            waiting = self._unacked
+            self._unacked = 0
+            raise EINK_timeout("No reply after {0}s, {1} commands "
+                               "waiting".format(self.timeout, waiting))
+
+    async def _await_ack(self):
+        """Wait for one "OK" reply."""
+
+        reply = await self._read_reply()
+        self._unacked -= 1
+        if reply != b"OK":
+            raise EINK_invalid_cmd("Display rejected command: {0}".format(
+                reply))
+
+    async def _settle(self):
+        """Wait until no more than max_in_flight commands are pending."""
+
+        while self._unacked > self.max_in_flight:
+            await self._await_ack()
+
+    async def drain(self):
+        """Wait for every command sent to be acknowledged."""
+
+        while self._unacked > 0:
+            await self._await_ack()
+
+    async def ahand_shake(self):
+        """Try handshake with the e-ink controller, see hand_shake()."""
+
+        await self.drain()
+        self._send(self._SYS_CMD_HANDSHAKE)
+        hand_shake_status = await self._read_reply()
+        if hand_shake_status != b"OK":
+            if self._stats is not None:
+                self._stats["serial_not_ready"] += 1
+            raise EINK_serial_not_ready("Handshake failed")
+        self._font_size = await self._aquery_font_size()
+        return (hand_shake_status)
+
+    async def _aquery_font_size(self):
+        """Ask the display for the font size, returns None if unknown."""
+
+        await self.drain()
+        self._send(self._SYS_CMD_GET_ENG_FONT_SIZE)
+        # font indexes can be one or two bytes long
+        current_font_index = await self._read_reply(exact=False)
+        # If we get "OK" back the actual value follows it
+        if current_font_index == b"OK":
+            current_font_index = await self._read_reply(exact=False)
+        return (self._FONT_INDEXES.get(current_font_index))
+
+    async def aget_font_size(self):
+        """Get the currently set font size, see get_font_size()."""
+
+        if self._font_size is None:
+            self._font_size = await self._aquery_font_size()
+        return (self._font_size)
+
+    async def aset_font_size(self, size):
+        """Set the English display font size, see set_font_size()."""
+
+        self.set_font_size(size)
+        await self._settle()
+
+    async def aclear_display(self):
+        """Clear the display, see clear_display()."""
+
+        self.clear_display()
+        await self._settle()
+
+    async def awrite_string(self, string, x_pos, y_pos):
+        """Write a text string to the display, see write_string()."""
+
+        self.write_string(string, x_pos, y_pos)
+        await self._settle()
+
+    async def awrite_line(self, string, size, line_number):
+        """Write text based on a line number and size, see write_line()."""
+
+        self.write_line(string, size, line_number)
+        await self._settle()
+
+    async def acommit(self):
+        """Send the open batch, see commit()."""
+
+        self.commit()
+        await self._settle()
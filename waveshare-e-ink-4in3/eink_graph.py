@@ -0,0 +1,154 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : History graphs for the Wave Share 4.2" e-ink display
+
+from eink import EINK_display, EINK_invalid_cmd
+
+"""Sparkline graphs, drawn as one batch with a single refresh
+
+Exported class's:
+EINK_graph -- Graph of a series of readings in a box on the display
+
+"""
+
+
+class EINK_graph:
+    def __init__(self, display, x_pos, y_pos, width, height, border=True,
+                 low=None, high=None):
+        """Set up a graph, nothing is drawn until draw()
+
+        Keyword arguments:
+        display -- EINK_display or EINK_display_async to draw on
+        x_pos, y_pos -- pixel position of the top left corner
+        width, height -- size of the graph in pixels
+        border -- draw a box around the graph
+        low, high -- values at the bottom and top of the graph, the
+                     lowest and highest value drawn if None
+
+
+        """
+
+        if width < 2 or height < 2:
+            raise EINK_invalid_cmd("Graph must be at least 2x2 pixels")
+        self.display = display
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.width = width
+        self.height = height
+        self.border = border
+        self.low = low
+        self.high = high
+
+    def decimate(self, series):
+        """Reduce a series to at most one (low, high) pair per pixel column.
+
+        Each column keeps the lowest and highest value of the readings
+        that fall in it, so spikes survive the downsampling.
+
+        Returns:
+        list -- (low, high) tuples, one per column, oldest first
+
+        """
+
+        count = len(series)
+        columns = min(count, self.width)
+        result = []
+        start = 0
+        for column in range(columns):
+            end = (column + 1) * count // columns
+            low = high = series[start]
+            for i in range(start + 1, end):
+                value = series[i]
+                if value < low:
+                    low = value
+                elif value > high:
+                    high = value
+            result.append((low, high))
+            start = end
+        return (result)
+
+    def _queue(self, series):
+        """Queue the frames for a series in a new batch."""
+
+        display = self.display
+        x0 = self.x_pos
+        y0 = self.y_pos
+        x1 = x0 + self.width - 1
+        y1 = y0 + self.height - 1
+
+        display.begin()
+        try:
+            # Blank the box, then draw in black
+            display.set_color(EINK_display.WHITE, EINK_display.WHITE)
+            display.draw_rect(x0, y0, x1, y1, fill=True)
+            display.set_color(EINK_display.BLACK, EINK_display.WHITE)
+            if self.border:
+                display.draw_rect(x0, y0, x1, y1)
+            if not series:
+                return
+
+            columns = self.decimate(series)
+            low = self.low
+            high = self.high
+            if low is None:
+                low = min(column[0] for column in columns)
+            if high is None:
+                high = max(column[1] for column in columns)
+            span = high - low
+            if span <= 0:
+                span = 1
+                low -= 0.5
+            # Pixels per unit, the top and bottom rows are kept for values
+            scale = (self.height - 1) / span
+
+            count = len(columns)
+            step = (self.width - 1) / max(count - 1, 1)
+            last_x = last_bottom = last_top = None
+            for i in range(count):
+                # Clamp to the box, values outside low and high sit on
+                # the edge
+                bottom = y1 - int((columns[i][0] - low) * scale)
+                top = y1 - int((columns[i][1] - low) * scale)
+                bottom = min(max(bottom, y0), y1)
+                top = min(max(top, y0), y1)
+                x = x0 + int(i * step)
+                if last_x is None:
+                    pass
+                elif x - last_x > 1:
+                    # Fewer readings than pixels, join the readings up
+                    display.draw_line(last_x, (last_bottom + last_top) // 2,
+                                      x, (bottom + top) // 2)
+                else:
+                    # Stretch the column to touch the last one, so the
+                    # trace has no gaps
+                    top = min(top, last_bottom)
+                    bottom = max(bottom, last_top)
+                if top == bottom:
+                    display.draw_point(x, top)
+                else:
+                    display.draw_line(x, top, x, bottom)
+                last_x, last_bottom, last_top = x, bottom, top
+        except Exception:
+            display.abort()
+            raise
+
+    def draw(self, series):
+        """Draw a series of readings, replacing the last graph
+
+        All frames are sent in one UART write with a single refresh.
+
+        Keyword arguments:
+        series -- readings oldest first, a list, tuple or array, longer
+                  series are decimated to the graph width
+
+
+        """
+
+        self._queue(series)
+        self.display.commit()
+
+    async def adraw(self, series):
+        """Same as draw(), for EINK_display_async"""
+
+        self._queue(series)
+        await self.display.acommit()
@@ -0,0 +1,177 @@
+# Author Brendan Horan
+# License : BSD 3-Clause
+# Description : Dashboard layouts for the Wave Share 4.2" e-ink display
+
+from eink import EINK_invalid_cmd
+
+"""Declarative dashboard layout, only regions whose text changed are drawn
+
+Exported class's:
+EINK_region -- One text region, its position is worked out once
+EINK_layout -- Regions on a display, updated in a single batch
+
+"""
+
+# Display resolution in pixels
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+# Pixel width of one character for each English font size
+_CHAR_WIDTHS = {"small": 16, "medium": 24, "large": 32}
+
+
+class EINK_region:
+    def __init__(self, name, field, x_pos, y_pos, size, format, chars):
+        """Set up a region, use EINK_layout.add() instead of calling this
+
+        Keyword arguments:
+        name -- name of the region
+        field -- key or attribute of the values passed to update()
+        x_pos, y_pos -- pixel position of the region
+        size -- font size (small, medium, large)
+        format -- format string applied to the value
+        chars -- most characters that fit in the region
+
+
+        """
+
+        self.name = name
+        self.field = field
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.size = size
+        self.format = format
+        self.chars = chars
+        # Text on the display, None if not known
+        self.text = None
+
+    def render(self, value):
+        """Format a value, returns the text cut to fit the region"""
+
+        if value is None:
+            text = "-"
+        else:
+            text = self.format.format(value)
+        return (text[:self.chars])
+
+
+class EINK_layout:
+    def __init__(self, display, columns=1):
+        """Set up an empty layout
+
+        Keyword arguments:
+        display -- EINK_display or EINK_display_async to draw on
+        columns -- number of equal width columns across the display
+
+
+        """
+
+        self.display = display
+        self.columns = columns
+        self._regions = {}
+        # Regions sorted by font size, so each size is set once per update
+        self._order = []
+
+    def add(self, name, row, column=0, size="large", format="{0}",
+            field=None):
+        """Add a region, its position is worked out here and never again
+
+        Keyword arguments:
+        name -- name of the region, must be unique
+        row -- line number, as used by EINK_display.write_line()
+        column -- column number, starting from 0
+        size -- font size (small, medium, large)
+        format -- format string for the value, such as "PM2.5 {0}ug"
+        field -- key or attribute of the values passed to update(),
+                 defaults to name
+
+
+        """
+
+        if name in self._regions:
+            raise EINK_invalid_cmd("Region {0} already exists".format(name))
+        if not 0 <= column < self.columns:
+            raise EINK_invalid_cmd("Invalid column {0}, the layout has {1}"
+                                   .format(column, self.columns))
+        y_pos = self.display.line_position(size, row)
+        width = SCREEN_WIDTH // self.columns
+        region = EINK_region(name, field or name, column * width, y_pos,
+                             size, format, width // _CHAR_WIDTHS[size])
+        self._regions[name] = region
+        self._order.append(region)
+        self._order.sort(key=lambda region: region.size)
+        return (region)
+
+    def invalidate(self):
+        """Forget what every region shows, call after clear_display()"""
+
+        for region in self._order:
+            region.text = None
+
+    def _queue(self, values):
+        """Queue the changed regions, returns (region, text) pairs."""
+
+        changed = []
+        is_dict = isinstance(values, dict)
+        for region in self._order:
+            try:
+                if is_dict:
+                    value = values[region.field]
+                else:
+                    value = getattr(values, region.field)
+            except (KeyError, AttributeError):
+                # Not in this update, leave the region as it is
+                continue
+            text = region.render(value)
+            if text != region.text:
+                changed.append((region, text))
+
+        if not changed:
+            return (changed)
+        display = self.display
+        display.begin()
+        try:
+            for region, text in changed:
+                # Pad with spaces to cover any longer text shown before
+                old = region.text
+                if old is not None and len(old) > len(text):
+                    text += " " * (len(old) - len(text))
+                display.set_font_size(region.size)
+                display.write_string(text, region.x_pos, region.y_pos)
+        except Exception:
+            display.abort()
+            raise
+        return (changed)
+
+    def _shown(self, changed):
+        """Remember the text now on the display."""
+
+        for region, text in changed:
+            region.text = text
+        return (len(changed))
+
+    def update(self, values):
+        """Draw the regions whose text changed, with a single refresh
+
+        Keyword arguments:
+        values -- dict or object, such as a namedtuple, holding the
+                  fields of the regions. Regions whose field is missing
+                  are left as they are.
+
+        Returns the number of regions drawn, 0 if nothing was sent.
+
+
+        """
+
+        changed = self._queue(values)
+        if changed:
+            self.display.commit()
+        return (self._shown(changed))
+
+    async def aupdate(self, values):
+        """Same as update(), for EINK_display_async"""
+
+        changed = self._queue(values)
+        if changed:
+            await self.display.acommit()
+        return (self._shown(changed))
@@ -3,7 +3,9 @@
 # Description : Set up a Wifi connection
 
 import network
-from time import sleep
+from binascii import hexlify, unhexlify
+from time import sleep_ms, ticks_ms, ticks_diff
+from driver_stats import Driver_stats
 
 """WiFi setup wrapper, used to set up a connection
 
@@ -18,38 +20,195 @@ class WiFi_connection_issue(Exception):
     pass
 
 
-class WIFI_Base:
-    def __init__(self, ssid, password):
+class WIFI_Base(Driver_stats):
+    def __init__(self, ssid, password, bssid=None, channel=None):
         """Set SSID name and password
 
         Keyword arguments:
         ssid -- The SSID name
         password -- The password for the network
+        bssid -- MAC address of the access point to use, found after the
+                 first connect if not given
+        channel -- WiFi channel of that access point
 
         """
 
         self.ssid = ssid
         self.password = password
+        self.bssid = bssid
+        self.channel = channel
+        self.wlan = None
+
+        # Counters, None while counting is off
+        self._stats = None
+
+    def save_state(self):
+        """Get the access point to keep across a deep sleep
+
+        Returns:
+        list -- bssid as hex and channel, None if no access point is known
+
+        """
+
+        if self.bssid is None:
+            return (None)
+        return ([hexlify(self.bssid).decode(), self.channel])
+
+    def load_state(self, state):
+        """Restore the access point from save_state(), skipping the scan"""
+
+        if state is None:
+            return
+        self.bssid = unhexlify(state[0])
+        self.channel = state[1]
+
+    # Counters kept by enable_stats()
+    _STAT_NAMES = ("connects", "connection_issues", "connect_wait_ms",
+                   "access_point_scans")
 
 
 class WIFI_setup(WIFI_Base):
-    def connect(self):
-        """Attempt to connect to WiFi network"""
+    # Poll isconnected() every 50ms at first, backing off to 500ms
+    _POLL_MIN_MS = 50
+    _POLL_MAX_MS = 500
 
-        print("Wifi setup beginning")
-        wlan = network.WLAN(network.STA_IF)
+    def _start(self):
+        """Start connecting, returns without waiting."""
+
+        if self.wlan is None:
+            self.wlan = network.WLAN(network.STA_IF)
+        wlan = self.wlan
         wlan.active(True)
-        wlan.connect(self.ssid, self.password)
+        if self._stats is not None:
+            self._stats["connects"] += 1
+
+        if self.bssid is None:
+            wlan.connect(self.ssid, self.password)
+            return
+        # A known access point and channel skips the full channel scan
+        if self.channel is not None:
+            try:
+                wlan.config(channel=self.channel)
+            except (OSError, ValueError):
+                pass
+        wlan.connect(self.ssid, self.password, bssid=self.bssid)
+
+    def _connected(self, start):
+        """Print the connection details."""
+
+        if self._stats is not None:
+            self._stats["connect_wait_ms"] += ticks_diff(ticks_ms(), start)
+        print("connected:")
+        print(self.wlan.ifconfig())
+
+    def _failed(self, start):
+        """Stop trying, forget the access point and raise."""
+
+        if self._stats is not None:
+            self._stats["connect_wait_ms"] += ticks_diff(ticks_ms(), start)
+            self._stats["connection_issues"] += 1
+        self.wlan.disconnect()
+        # The access point may have moved, scan normally next time
+        self.bssid = None
+        self.channel = None
+        raise WiFi_connection_issue("Could not connect to AP")
+
+    def find_access_point(self):
+        """Find the strongest access point for the SSID.
+
+        Sets and returns the bssid and channel, None if nothing was found.
+        The scan blocks for around 2 seconds, with uasyncio call it when
+        no other task needs to run.
+
+        """
+
+        if self._stats is not None:
+            self._stats["access_point_scans"] += 1
+        best = None
+        for ssid, bssid, channel, rssi, _, _ in self.wlan.scan():
+            if ssid.decode() == self.ssid and (best is None or
+                                               rssi > best[2]):
+                best = (bssid, channel, rssi)
+        if best is None:
+            return (None)
+        self.bssid, self.channel = best[0], best[1]
+        return ((self.bssid, self.channel))
+
+    def isconnected(self):
+        """Check the connection, returns True or False"""
+
+        return (self.wlan is not None and self.wlan.isconnected())
+
+    def connect(self, timeout=10, scan=False):
+        """Attempt to connect to WiFi network
+
+        Keyword arguments:
+        timeout -- seconds to wait for the connection
+        scan -- once connected, find the access point with
+                find_access_point() if none is known yet, so later
+                connects skip the channel scan
 
-        # takes around 5 seconds for the esp32 to negotiate
-        sleep(5)
+        """
+
+        print("Wifi setup beginning")
+        self._start()
 
         # .status() on esp32 returns "none".. Always...
         # only choice we have is to see if its connected
         # this also means we can't know why the connection failed
-        if wlan.isconnected() is True:
-            print("connected:")
-            print(wlan.ifconfig())
-        else:
-            wlan.disconnect()
-            raise WiFi_connection_issue("Could not connect to AP")
+        start = ticks_ms()
+        wait = self._POLL_MIN_MS
+        while not self.wlan.isconnected():
+            if ticks_diff(ticks_ms(), start) >= timeout * 1000:
+                self._failed(start)
+            sleep_ms(wait)
+            wait = min(wait * 2, self._POLL_MAX_MS)
+        self._connected(start)
+        if scan and self.bssid is None:
+            self.find_access_point()
+
+    async def aconnect(self, timeout=10):
+        """Attempt to connect to WiFi network without blocking uasyncio
+
+        The access point is not scanned for, as the scan blocks. Call
+        find_access_point() at a quiet time to get the fast reconnect.
+
+        Keyword arguments:
+        timeout -- seconds to wait for the connection
+
+        """
+
+        import uasyncio
+
+        print("Wifi setup beginning")
+        self._start()
+
+        start = ticks_ms()
+        wait = self._POLL_MIN_MS
+        while not self.wlan.isconnected():
+            if ticks_diff(ticks_ms(), start) >= timeout * 1000:
+                self._failed(start)
+            await uasyncio.sleep_ms(wait)
+            wait = min(wait * 2, self._POLL_MAX_MS)
+        self._connected(start)
+
+    async def watchdog(self, interval=5, timeout=10):
+        """Reconnect whenever the connection drops, runs forever
+
+        Keyword arguments:
+        interval -- seconds between connection checks
+        timeout -- seconds to wait for each reconnect
+
+        """
+
+        import uasyncio
+
+        while True:
+            if not self.isconnected():
+                try:
+                    await self.aconnect(timeout)
+                except (WiFi_connection_issue, OSError) as error:
+                    # OSError: the esp32 raises "Wifi Internal Error" if
+                    # connect() is called while it is reconnecting itself
+                    print("Wifi reconnect failed, retrying", error)
+            await uasyncio.sleep(interval)